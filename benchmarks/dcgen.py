@@ -0,0 +1,137 @@
+"""Generates synthetic dc files to benchmark AstronKit on dc sets of any size.
+
+The output only depends on the options, so a given configuration always benchmarks the same file.
+
+Usage: python -m benchmarks.dcgen out.dc [--classes 500] [--structs 20] [--fields 8] [--depth 4]
+       [--array-depth 2] [--keywords default] [--seed 0]
+"""
+
+import argparse
+import dataclasses
+import random
+from typing import Dict, List, Tuple
+
+BASIC_TYPES = ["int8", "int16", "int32", "int64", "uint8", "uint16", "uint32", "uint64"]
+BASIC_TYPES += ["float64", "string", "blob", "char", "uint32array", "uint32uint8array"]
+
+# Keyword sets with their weights, these decide which stub files every field ends up in
+KEYWORD_MIXES: Dict[str, List[Tuple[str, int]]] = {
+    "default": [
+        ("required broadcast ram", 3),
+        ("broadcast ram", 3),
+        ("required broadcast db", 2),
+        ("airecv clsend", 3),
+        ("ownrecv", 2),
+        ("ownsend airecv", 1),
+        ("broadcast", 2),
+        ("airecv", 2),
+        ("db", 1),
+        ("", 1),
+    ],
+    # Mostly fields that are visible to every category, i.e. the largest stubs
+    "broadcast": [("required broadcast ram", 4), ("broadcast", 4), ("clsend airecv", 1)],
+    # Mostly fields only the AI cares about
+    "ai": [("airecv", 4), ("db", 2), ("required ram", 2), ("broadcast", 1)],
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class DCGenOptions:
+    classes: int = 500
+    structs: int = 20
+    # Fields per class and per struct
+    fields: int = 8
+    # Longest chain of dclass inheritance
+    depth: int = 4
+    # Largest number of nested arrays in a parameter
+    array_depth: int = 2
+    keywords: str = "default"
+    seed: int = 0
+
+
+class DCGenerator:
+    def __init__(self, options: DCGenOptions) -> None:
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.structs: List[str] = []
+        # Class name and its inheritance depth
+        self.classes: List[Tuple[str, int]] = []
+
+    def make_type(self) -> str:
+        if self.structs and self.random.random() < 0.15:
+            base = self.random.choice(self.structs)
+        else:
+            base = self.random.choice(BASIC_TYPES)
+            if base.startswith(("int", "uint")) and self.random.random() < 0.1:
+                base += " / 100"
+        for _ in range(self.random.randint(0, self.options.array_depth)):
+            if self.random.random() < 0.5:
+                break
+            base += "[]" if self.random.random() < 0.8 else f"[{self.random.randint(1, 8)}]"
+        return base
+
+    def make_parameters(self) -> str:
+        return ", ".join(self.make_type() for _ in range(self.random.randint(0, 5)))
+
+    def make_keywords(self) -> str:
+        mix = KEYWORD_MIXES[self.options.keywords]
+        return self.random.choices([k for k, _ in mix], [w for _, w in mix])[0]
+
+    def make_struct(self, index: int) -> List[str]:
+        name = f"Struct{index}"
+        rows = [f"struct {name} {{"]
+        for i in range(self.random.randint(1, self.options.fields)):
+            rows.append(f"  {self.make_type()} field{i};")
+        rows.append("};")
+        self.structs.append(name)
+        return rows
+
+    def make_class(self, index: int) -> List[str]:
+        name = f"DistributedGen{index}"
+        parents = [(n, d) for n, d in self.classes if d < self.options.depth]
+        depth = 1
+        header = f"dclass {name}"
+        if parents and self.random.random() < 0.7:
+            parent, parent_depth = self.random.choice(parents)
+            depth = parent_depth + 1
+            header += f" : {parent}"
+        rows = [header + " {"]
+        for i in range(self.random.randint(1, self.options.fields)):
+            keywords = self.make_keywords()
+            field = f"  setGen{index}Field{i}({self.make_parameters()})"
+            rows.append(f"{field} {keywords};" if keywords else f"{field};")
+        rows.append("};")
+        self.classes.append((name, depth))
+        return rows
+
+    def generate(self) -> str:
+        rows: List[str] = []
+        for i in range(self.options.structs):
+            rows += self.make_struct(i)
+        for i in range(self.options.classes):
+            rows += self.make_class(i)
+        # Every class gets CL, AI and UD variants, as in most games
+        imports = [f"from game import {n}/AI/UD" for n, _ in self.classes]
+        return "\n".join(imports + [""] + rows) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    _ = parser.add_argument("output")
+    for field in dataclasses.fields(DCGenOptions):
+        _ = parser.add_argument(
+            "--" + field.name.replace("_", "-"),
+            type=type(field.default),
+            default=field.default,
+            choices=list(KEYWORD_MIXES) if field.name == "keywords" else None,
+        )
+    args = parser.parse_args()
+    options = DCGenOptions(
+        **{f.name: getattr(args, f.name) for f in dataclasses.fields(DCGenOptions)}
+    )
+    with open(args.output, "w") as f:
+        _ = f.write(DCGenerator(options).generate())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Compares dumping each category with its own PythonDumper against a single MultiDumper pass.
+
+Usage: python -m benchmarks.dumper file.dc [file.dc...]
+"""
+
+import sys
+import time
+from typing import Dict, List
+
+from astronkit.python_dumper import Category, MultiDumper, PythonDumper
+from astronkit.python_parser import parse_dcfiles
+from astronkit.types import DistributedFileDef
+
+CATEGORIES: List[Category] = ["AI", "CL", "UD", "OV"]
+
+
+def dump_separately(parsed: DistributedFileDef) -> Dict[Category, str]:
+    return {
+        k: PythonDumper(sys.version_info[:2], k, "direct.distributed").dump_file(parsed)
+        for k in CATEGORIES
+    }
+
+
+def dump_together(parsed: DistributedFileDef) -> Dict[Category, str]:
+    dumper = MultiDumper(sys.version_info[:2], CATEGORIES, "direct.distributed")
+    return dumper.dump_files(parsed)
+
+
+def main(files: List[str]) -> None:
+    parsed = parse_dcfiles(files, set())
+    results: Dict[str, Dict[Category, str]] = {}
+    for name, dump in (("separate", dump_separately), ("single pass", dump_together)):
+        start = time.perf_counter()
+        results[name] = dump(parsed)
+        print(f"{name:>12}: {time.perf_counter() - start:.3f}s")
+
+    assert results["separate"] == results["single pass"], "Outputs differ!"
+    size = sum(len(x) for x in results["single pass"].values())
+    print(f"Output: {size / 1024:.0f} KiB in {len(CATEGORIES)} files")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
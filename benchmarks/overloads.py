@@ -0,0 +1,55 @@
+"""Compares the size of the classic stub layout against --compact-overloads.
+
+If pyright or mypy is on the PATH, also times a type check of each layout.
+
+Usage: python -m benchmarks.overloads file.dc [file.dc...]
+"""
+
+import importlib.util
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from astronkit.python_dumper import Category, DumperOptions, MultiDumper
+from astronkit.python_parser import parse_dcfiles
+
+CATEGORIES: List[Category] = ["AI", "CL", "UD", "OV"]
+CHECKERS: Dict[str, List[str]] = {}
+if shutil.which("pyright") is not None:
+    CHECKERS["pyright"] = ["pyright"]
+if importlib.util.find_spec("mypy") is not None:
+    CHECKERS["mypy"] = [sys.executable, "-m", "mypy", "--no-incremental"]
+
+
+def main(files: List[str]) -> None:
+    parsed = parse_dcfiles(files, set())
+    for name, options in (
+        ("classic", DumperOptions()),
+        ("compact", DumperOptions(compact_overloads=True)),
+    ):
+        dumper = MultiDumper(sys.version_info[:2], CATEGORIES, "direct.distributed", options)
+        outputs = dumper.dump_files(parsed)
+        size = sum(len(x) for x in outputs.values())
+        lines = sum(x.count("\n") + 1 for x in outputs.values())
+        print(f"{name}: {size / 1024:.0f} KiB, {lines} lines")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir = pathlib.Path(tmp, "astronkit_data")
+            out_dir.mkdir()
+            _ = (out_dir / "__init__.py").write_text("")
+            for k, content in outputs.items():
+                _ = (out_dir / f"AstronStubs{k}.py").write_text(content)
+            for checker, command in CHECKERS.items():
+                start = time.perf_counter()
+                _ = subprocess.run(
+                    command + [str(out_dir)], cwd=tmp, capture_output=True
+                )
+                print(f"    {checker}: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,167 @@
+"""Times every phase of the stub generation on synthetic dc files, and records the output sizes.
+
+Results can be saved as JSON and compared with an earlier run, i.e. the last release, so that
+regressions in generation time or stub size show up before they are shipped.
+
+Usage: python -m benchmarks.suite [--scenario NAME...] [--repeat 3] [--output results.json]
+       [--compare baseline.json] [--threshold 0.1]
+"""
+
+import argparse
+import dataclasses
+import importlib.util
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from benchmarks.dcgen import DCGenerator, DCGenOptions
+
+from astronkit.cache import get_astronkit_version
+from astronkit.python_dumper import Category, MultiDumper, PythonDumper
+from astronkit.python_parser import parse_dcfiles
+
+# Bump this whenever the layout of the results changes
+RESULTS_FORMAT = 1
+CATEGORIES: List[Category] = ["AI", "CL", "UD", "OV"]
+SCENARIOS: Dict[str, DCGenOptions] = {
+    "small": DCGenOptions(classes=100, structs=5),
+    "medium": DCGenOptions(classes=500),
+    "large": DCGenOptions(classes=2000, structs=50, fields=10),
+    "deep": DCGenOptions(classes=500, depth=12),
+    "arrays": DCGenOptions(classes=500, array_depth=4),
+    "broadcast": DCGenOptions(classes=500, keywords="broadcast"),
+}
+HAS_PANDA3D = importlib.util.find_spec("panda3d") is not None
+T = TypeVar("T")
+
+
+def measure(repeat: int, func: Callable[[], T]) -> Tuple[float, T]:
+    """Best wall time out of a few runs, which is the least noisy."""
+    start = time.perf_counter()
+    result = func()
+    best = time.perf_counter() - start
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        _ = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_scenario(options: DCGenOptions, repeat: int) -> Dict[str, Any]:
+    timings: Dict[str, float] = {}
+    version = sys.version_info[:2]
+    with tempfile.TemporaryDirectory() as tmp:
+        dc_path = pathlib.Path(tmp, "bench.dc")
+        _ = dc_path.write_text(DCGenerator(options).generate())
+
+        timings["python_parser"], parsed = measure(
+            repeat, lambda: parse_dcfiles([dc_path], set())
+        )
+        if HAS_PANDA3D:
+            from panda3d.direct import DCFile
+
+            from astronkit.dclass_parser import parse_dcfile
+
+            def read() -> DCFile:
+                dcfile = DCFile()
+                if not dcfile.read(str(dc_path)):
+                    raise ValueError(f"Unable to read dcfile: {dc_path}")
+                return dcfile
+
+            timings["read"], dcfile = measure(repeat, read)
+            timings["build"], parsed = measure(repeat, lambda: parse_dcfile(dcfile, set()))
+
+        outputs: Dict[Category, str] = {}
+        for k in CATEGORIES:
+            # Every category gets its own dumper, so that they are timed separately
+            timings[f"dump_{k}"], outputs[k] = measure(
+                repeat, lambda: PythonDumper(version, k, "direct.distributed").dump_file(parsed)
+            )
+
+        def write() -> None:
+            fps = {k: open(pathlib.Path(tmp, f"AstronStubs{k}.py"), "w") for k in CATEGORIES}
+            try:
+                MultiDumper(version, CATEGORIES, "direct.distributed").write_files(parsed, fps)
+            finally:
+                for f in fps.values():
+                    f.close()
+
+        timings["write"], _ = measure(repeat, write)
+
+    return {
+        "options": dataclasses.asdict(options),
+        "timings": timings,
+        "sizes": {k: len(v.encode()) for k, v in outputs.items()},
+        "lines": {k: v.count("\n") + 1 for k, v in outputs.items()},
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    """Prints the changes against the baseline, and returns the regressions."""
+    regressions: List[str] = []
+    for name, scenario in results["scenarios"].items():
+        base: Optional[Dict[str, Any]] = baseline["scenarios"].get(name)
+        if base is None or base["options"] != scenario["options"]:
+            print(f"{name}: not in the baseline, or generated with other options")
+            continue
+        print(f"{name}:")
+        for metric, limit in (("timings", threshold), ("sizes", 0.0)):
+            for key, value in scenario[metric].items():
+                if key not in base[metric]:
+                    continue
+                old = base[metric][key]
+                change = (value - old) / old if old else 0.0
+                flag = ""
+                if change > limit:
+                    flag = "  <-- regression"
+                    regressions.append(f"{name} {metric} {key}")
+                if metric == "timings":
+                    old_text, new_text = f"{old:.4f}s", f"{value:.4f}s"
+                else:
+                    old_text, new_text = f"{old:,} B", f"{value:,} B"
+                print(f"  {key:>14}: {old_text:>14} -> {new_text:>14} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    _ = parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    _ = parser.add_argument("--repeat", type=int, default=3)
+    _ = parser.add_argument("--output", type=pathlib.Path)
+    _ = parser.add_argument("--compare", type=pathlib.Path)
+    _ = parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Tolerated slowdown, sizes can't grow"
+    )
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "format": RESULTS_FORMAT,
+        "astronkit": get_astronkit_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        scenario = results["scenarios"][name] = run_scenario(SCENARIOS[name], args.repeat)
+        timings = ", ".join(f"{k} {v:.3f}s" for k, v in scenario["timings"].items())
+        size = sum(scenario["sizes"].values())
+        print(f"{name}: {timings}; output {size / 1024:.0f} KiB")
+
+    if args.output is not None:
+        _ = args.output.write_text(json.dumps(results, indent=2))
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("format") != RESULTS_FORMAT:
+            sys.exit(f"{args.compare} has another results format")
+        if regressions := compare(results, baseline, args.threshold):
+            sys.exit("Regressions: " + ", ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Times sending and receiving updates through the generated stubs against the Panda3D path.
+
+Needs Panda3D, the updates are formatted by its DCFile.
+
+Usage: python -m benchmarks.updates [--count 100000]
+"""
+
+import argparse
+import importlib
+import pathlib
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from panda3d.core import Datagram, DatagramIterator
+from panda3d.direct import DCFile, DCPacker
+
+from astronkit.python_dumper import DumperOptions, MultiDumper
+from astronkit.python_parser import parse_dcfiles
+
+DC = """
+from direct.distributed import DistributedObject/AI
+from game import DistributedAvatar/AI
+
+dclass DistributedObject {
+};
+
+dclass DistributedAvatar : DistributedObject {
+  setName(string) required broadcast ram;
+  setHp(int16) required broadcast ram;
+  setPos(int16 / 10, int16 / 10, int16 / 10) broadcast ram;
+  setInventory(uint8[]) required broadcast ram;
+  setEmote(uint8) broadcast;
+};
+"""
+# Every field is sent in turn
+UPDATES: List[Tuple[str, Tuple[Any, ...]]] = [
+    ("setName", ("Flippy",)),
+    ("setHp", (15,)),
+    ("setPos", (1.5, -2.0, 0.3)),
+    ("setInventory", ([1, 2, 3, 4],)),
+    ("setEmote", (3,)),
+]
+
+
+class Repository:
+    """Sends like Astron's AI repository, without a connection."""
+
+    def __init__(self, dcfile: DCFile) -> None:
+        self.dclassesByName: Dict[str, Any] = {}
+        for i in range(dcfile.getNumClasses()):
+            dclass = dcfile.getClass(i)
+            self.dclassesByName[dclass.getName() + "AI"] = dclass
+        self.ourChannel = 4000
+        self.sent = 0
+
+    def send(self, dg: Any) -> None:
+        self.sent += 1
+
+    def sendUpdate(self, do: Any, fieldName: str, args: Any) -> None:
+        self.sendUpdateToChannel(do, do.doId, fieldName, args)
+
+    def sendUpdateToChannel(self, do: Any, channelId: int, fieldName: str, args: Any) -> None:
+        field = do.dclass.getFieldByName(fieldName)
+        self.send(field.aiFormatUpdate(do.doId, channelId, self.ourChannel, args))
+
+
+def load_stubs(
+    directory: pathlib.Path, package: str, options: DumperOptions, category: str = "AI"
+) -> Any:
+    parsed = parse_dcfiles([directory / "bench.dc"], set())
+    dumper = MultiDumper(sys.version_info[:2], [category], "direct.distributed", options)
+    out_dir = directory / package
+    out_dir.mkdir()
+    _ = (out_dir / "__init__.py").write_text("")
+    _ = (out_dir / f"AstronStubs{category}.py").write_text(dumper.dump_files(parsed)[category])
+    return importlib.import_module(f"{package}.AstronStubs{category}")
+
+
+def make_avatar(stubs: Any, air: Repository) -> Any:
+    class DistributedAvatarAI(stubs.StubDistributedAvatarAI):
+        def getName(self) -> str:
+            return "Flippy"
+
+        def getHp(self) -> int:
+            return 15
+
+        def getInventory(self) -> List[int]:
+            return []
+
+    avatar = DistributedAvatarAI(air)
+    avatar.doId = 100000001
+    return avatar
+
+
+def make_receiver(stubs: Any, dcfile: DCFile) -> Any:
+    # The broadcast fields are received by the clients
+    class DistributedAvatar(stubs.StubDistributedAvatar):
+        def __init__(self) -> None:
+            self.dclass = dcfile.getClassByName("DistributedAvatar")
+
+        def setName(self, name: str) -> None:
+            pass
+
+        def setHp(self, hp: int) -> None:
+            pass
+
+        def setPos(self, x: float, y: float, z: float) -> None:
+            pass
+
+        def setInventory(self, inventory: Any) -> None:
+            pass
+
+        def setEmote(self, emote: int) -> None:
+            pass
+
+    return DistributedAvatar()
+
+
+def make_datagrams(dcfile: DCFile, count: int) -> List[Datagram]:
+    """The field number and arguments of every update, as they are read from a received message."""
+    dclass = dcfile.getClassByName("DistributedAvatar")
+    datagrams: List[Datagram] = []
+    for field_name, value in UPDATES:
+        field = dclass.getFieldByName(field_name)
+        packer = DCPacker()
+        packer.beginPack(field)
+        field.packArgs(packer, value)
+        assert packer.endPack()
+        dg = Datagram()
+        dg.addUint16(field.getNumber())
+        dg.appendData(packer.getBytes())
+        datagrams.append(dg)
+    return [datagrams[i % len(datagrams)] for i in range(count)]
+
+
+def time_receives(receive: Callable[[Any], None], datagrams: List[Datagram]) -> float:
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for dg in datagrams:
+            receive(DatagramIterator(dg))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_sends(send: Callable[[str, Tuple[Any, ...]], None], count: int) -> float:
+    """The best time of a few runs, the others were slowed down by something else."""
+    updates = [UPDATES[i % len(UPDATES)] for i in range(count)]
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for field, value in updates:
+            send(field, value)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = pathlib.Path(tmp)
+        _ = (directory / "bench.dc").write_text(DC)
+        dcfile = DCFile()
+        _ = dcfile.read(str(directory / "bench.dc"))
+        air = Repository(dcfile)
+        sys.path.insert(0, tmp)
+        classic = make_avatar(load_stubs(directory, "classic", DumperOptions()), air)
+        numbered = make_avatar(
+            load_stubs(directory, "numbered", DumperOptions(field_numbers=True)), air
+        )
+
+        def by_index(field: str, value: Tuple[Any, ...]) -> None:
+            # What --field-numbers did before resolving the fields once per class
+            dcfield = numbered.dclass.getFieldByIndex(numbered.FIELD_NUMBERS[field])
+            air.send(dcfield.aiFormatUpdate(numbered.doId, numbered.doId, air.ourChannel, value))
+
+        report(
+            "Sends",
+            {
+                "air.sendUpdate, by name": time_sends(classic.sendUpdate, count),
+                "getFieldByIndex per send": time_sends(by_index, count),
+                "--field-numbers": time_sends(numbered.sendUpdate, count),
+            },
+            count,
+        )
+
+        # Formatting the datagram takes most of a send, these are the field lookups alone
+        stubs = sys.modules["numbered.AstronStubsAI"]
+        dclass = numbered.dclass
+        numbers = numbered.FIELD_NUMBERS
+        report(
+            "Field lookups",
+            {
+                "getFieldByName": time_sends(lambda f, v: dclass.getFieldByName(f), count),
+                "getFieldByIndex": time_sends(
+                    lambda f, v: dclass.getFieldByIndex(numbers[f]), count
+                ),
+                "--field-numbers": time_sends(
+                    lambda f, v: (
+                        stubs.dc_fields.get(numbered.__class__)
+                        or stubs.resolve_fields(numbered)
+                    )[f],
+                    count,
+                ),
+            },
+            count,
+        )
+
+        # Reading the arguments is most of a receive, the call of the method is the same
+        datagrams = make_datagrams(dcfile, count)
+        classic_receiver = make_receiver(load_stubs(directory, "received", DumperOptions(), "CL"), dcfile)
+        receiver = make_receiver(
+            load_stubs(directory, "dispatched", DumperOptions(dispatch_tables=True), "CL"), dcfile
+        )
+        buffers_receiver = make_receiver(
+            load_stubs(
+                directory,
+                "buffered",
+                DumperOptions(dispatch_tables=True, array_buffers=True),
+                "CL",
+            ),
+            dcfile,
+        )
+        dispatch_update = sys.modules["dispatched.AstronStubsCL"].dispatch_update
+        buffers_dispatch_update = sys.modules["buffered.AstronStubsCL"].dispatch_update
+        report(
+            "Receives",
+            {
+                "dclass.receiveUpdate": time_receives(
+                    lambda di: classic_receiver.dclass.receiveUpdate(classic_receiver, di),
+                    datagrams,
+                ),
+                "--dispatch-tables": time_receives(lambda di: dispatch_update(receiver, di), datagrams),
+                "--array-buffers": time_receives(
+                    lambda di: buffers_dispatch_update(buffers_receiver, di), datagrams
+                ),
+            },
+            count,
+        )
+
+
+def report(title: str, results: Dict[str, float], count: int) -> None:
+    print(f"{title}:")
+    baseline = next(iter(results.values()))
+    for name, seconds in results.items():
+        print(f"    {name}: {seconds / count * 1e9:.0f} ns ({baseline / seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    _ = parser.add_argument("--count", type=int, default=100000)
+    main(parser.parse_args().count)
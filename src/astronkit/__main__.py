@@ -1,18 +1,71 @@
 import pathlib
-import sys
-from typing import Annotated, List, Literal, Optional, get_args
+import time
+from enum import Enum
+from typing import Annotated, Any, Callable, Collection, Dict, List, Optional, Tuple, Union
 
-from typer import Option, Typer
+from typer import Argument, BadParameter, Option, Typer
+from typer.core import TyperGroup
 
-from astronkit.dclass_parser import parse_dcfiles
-from astronkit.python_dumper import PythonDumper
+from astronkit import serialization
+from astronkit.analyzer import WireReport
+from astronkit.cache import GenerationCache, compute_key
+from astronkit.python_dumper import DumperOptions
+from astronkit.session import CATEGORIES, StubWriter
+from astronkit.stats import GenerationStats, phase
+from astronkit.types import DistributedClass, DistributedFileDef
+from astronkit.watch import reuse_unchanged, watch_files
 
-app = Typer()
 
+class DefaultCommandGroup(TyperGroup):
+    """Runs the generate command when the arguments don't start with the name of a command.
 
-@app.command()
+    The stubs are generated with `astronkit file.dc`. A callback with the arguments of generate
+    would take the name of the command as one of the dc files.
+    """
+
+    default_command = "generate"
+
+    def parse_args(self, ctx: Any, args: List[str]) -> List[str]:
+        group_options = {opt for param in self.get_params(ctx) for opt in param.opts}
+        if not args or (args[0] not in self.commands and args[0] not in group_options):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+app = Typer(cls=DefaultCommandGroup)
+
+
+class ParserBackend(str, Enum):
+    panda3d = "panda3d"
+    python = "python"
+
+
+class OutputFormat(str, Enum):
+    table = "table"
+    json = "json"
+
+
+# Every backend reads the dc files into its own object, that its parse_dcfile builds the IR from
+ReadDCFiles = Callable[[Collection[Union[str, pathlib.Path]]], Any]
+ParseDCFile = Callable[[Any, Collection[str]], DistributedFileDef]
+
+
+def load_parser(parser: ParserBackend) -> Tuple[ReadDCFiles, ParseDCFile]:
+    """The functions of the backend, imported lazily so that cached and IR runs don't load Panda3D."""
+    if parser == ParserBackend.panda3d:
+        from astronkit import dclass_parser
+
+        return dclass_parser.read_dcfiles, dclass_parser.parse_dcfile
+    from astronkit import python_parser
+
+    return python_parser.read_dcfiles, python_parser.parse_dcfile
+
+
+@app.command("generate")
 def main(
-    files: List[str],
+    files: Annotated[
+        Optional[List[str]], Argument(help="dc files to create stubs for")
+    ] = None,
     exclude: Annotated[
         Optional[List[str]],
         Option(help=">= 0 DClass names to not create stubs for, i.e. MyDclassAI"),
@@ -21,16 +74,269 @@ def main(
         str,
         Option(help="Package with the core Astron classes such as DistributedObject"),
     ] = "direct.distributed",
+    parser: Annotated[
+        ParserBackend,
+        Option(help="How to read the dc files: through Panda3D or the built-in parser"),
+    ] = ParserBackend.panda3d,
+    jobs: Annotated[
+        int,
+        Option(min=1, help="Number of processes used to create the stubs"),
+    ] = 1,
+    compact_overloads: Annotated[
+        bool,
+        Option(
+            help="Inherit unchanged sendUpdate overloads and merge fields with the same parameters"
+        ),
+    ] = False,
+    split_modules: Annotated[
+        bool,
+        Option(
+            help="Write a package per category with one lazily imported module per class"
+        ),
+    ] = False,
+    alias_tuples: Annotated[
+        bool,
+        Option(help="Define parameter tuples once, as aliases shared by every field using them"),
+    ] = False,
+    field_numbers: Annotated[
+        bool,
+        Option(help="Send updates by field number instead of looking the field up by name"),
+    ] = False,
+    batch_updates: Annotated[
+        bool,
+        Option(help="Add sendUpdates to the AI and UD stubs, to send several updates as one datagram"),
+    ] = False,
+    dispatch_tables: Annotated[
+        bool,
+        Option(help="Add tables of the received methods by field number, used by dispatch_update"),
+    ] = False,
+    array_buffers: Annotated[
+        bool,
+        Option(
+            help="Receive numeric arrays as array.array, decoded by dispatch_update (needs --dispatch-tables)"
+        ),
+    ] = False,
+    required_fields: Annotated[
+        bool,
+        Option(help="Add getRequiredFields to the AI stubs, to get every required field in one call"),
+    ] = False,
+    field_counters: Annotated[
+        bool,
+        Option(help="Count the updates sent and received by every field, see AstronCounters.py"),
+    ] = False,
+    validators: Annotated[
+        bool,
+        Option(
+            help="Check the arguments sent by the stubs when ASTRONKIT_VALIDATE is set, see AstronValidators.py"
+        ),
+    ] = False,
+    codecs: Annotated[
+        bool,
+        Option(help="Also write AstronCodecs.py, with struct codecs for the fixed-size fields"),
+    ] = False,
+    typing_stubs: Annotated[
+        bool,
+        Option(
+            help="Write the typing to a .pyi next to every stub file, and only the runtime parts to the .py"
+        ),
+    ] = False,
+    byte_compile: Annotated[
+        bool,
+        Option(help="Byte-compile the generated modules, so that the first import doesn't"),
+    ] = False,
+    cache: Annotated[
+        bool,
+        Option(help="Skip the generation if the inputs did not change since last run"),
+    ] = True,
+    dump_ir: Annotated[
+        Optional[pathlib.Path],
+        Option(help="Also save the parsed dc files to this path, to be used with --from-ir"),
+    ] = None,
+    from_ir: Annotated[
+        Optional[pathlib.Path],
+        Option(help="Generate the stubs from an IR saved by --dump-ir, without Panda3D"),
+    ] = None,
+    profile: Annotated[
+        bool,
+        Option(
+            help="Print the time and memory used by each phase, and what every file contains"
+        ),
+    ] = False,
+    stats_json: Annotated[
+        Optional[pathlib.Path],
+        Option(help="Save the statistics of --profile to this path, as JSON"),
+    ] = None,
+    top: Annotated[
+        int,
+        Option(min=0, help="Number of classes with the most generated lines in the statistics"),
+    ] = 10,
+    watch: Annotated[
+        bool,
+        Option(help="Keep running and regenerate the stubs every time the dc files change"),
+    ] = False,
+    interval: Annotated[
+        float,
+        Option(min=0.05, help="Seconds between two checks of the dc files with --watch"),
+    ] = 0.5,
+):
+    """Creates the typed stubs of the dc files, in astronkit_data. The default command."""
+    if (from_ir is None) == (not files):
+        raise BadParameter("Exactly one of dc files or --from-ir must be provided")
+    if from_ir is not None and (exclude or dump_ir is not None):
+        raise BadParameter(
+            "--exclude and --dump-ir are applied when parsing and can't be used with --from-ir"
+        )
+    if array_buffers and not dispatch_tables:
+        raise BadParameter(
+            "--array-buffers needs --dispatch-tables, Panda3D's receiveUpdate only builds lists"
+        )
+    if split_modules and jobs > 1:
+        raise BadParameter("--split-modules can't be used with --jobs yet")
+    if split_modules and typing_stubs:
+        raise BadParameter("--split-modules can't be used with --typing-stubs yet")
+
+    if watch and (from_ir is not None or jobs > 1 or profile or stats_json is not None):
+        raise BadParameter(
+            "--watch can't be used with --from-ir, --jobs, --profile or --stats-json"
+        )
+    options = DumperOptions(
+        compact_overloads=compact_overloads,
+        split_modules=split_modules,
+        alias_tuples=alias_tuples,
+        field_numbers=field_numbers,
+        batch_updates=batch_updates,
+        dispatch_tables=dispatch_tables,
+        array_buffers=array_buffers,
+        required_fields=required_fields,
+        field_counters=field_counters,
+        validators=validators,
+    )
+    out_dir = pathlib.Path("astronkit_data")
+    generation_cache = GenerationCache(out_dir)
+    # Statistics are about a generation, so they always regenerate
+    stats = GenerationStats() if profile or stats_json is not None else None
+    writer = StubWriter(
+        options, base_package, None, typing_stubs, codecs, byte_compile, jobs, stats
+    )
+
+    def make_key() -> str:
+        return compute_key(
+            [from_ir] if from_ir is not None else files or [],
+            {
+                **writer.cache_options(),
+                "exclude": sorted(exclude or []),
+                "parser": parser.value,
+                "dump_ir": str(dump_ir) if dump_ir else None,
+                "from_ir": from_ir is not None,
+            },
+            writer.target_version,
+        )
+
+    def parse() -> DistributedFileDef:
+        if from_ir is not None:
+            with phase(stats, "load_ir"):
+                return serialization.load_ir(from_ir)
+        assert files is not None
+        read_dcfiles, parse_dcfile = load_parser(parser)
+        with phase(stats, "read"):
+            dcfile = read_dcfiles(files)
+        with phase(stats, "build"):
+            parsed = parse_dcfile(dcfile, set(exclude or []))
+        if dump_ir is not None:
+            with phase(stats, "dump_ir"):
+                serialization.dump_ir(parsed, dump_ir)
+        return parsed
+
+    def write(parsed: DistributedFileDef, key: str) -> None:
+        writer.write(parsed, generation_cache)
+        generation_cache.save(key)
+
+    if watch:
+        # Renderings of the classes that did not change are reused by the next generations
+        writer.keep_renderings()
+        previous: Dict[str, DistributedClass] = {}
+
+        def regenerate() -> None:
+            nonlocal previous
+            start = time.perf_counter()
+            generation_cache.written = []
+            parsed, changed = reuse_unchanged(previous, parse())
+            write(parsed, make_key())
+            writer.prune(parsed.classes)
+            previous = {c.name: c for c in parsed.classes}
+            written = generation_cache.written
+            if len(written) > 5:
+                rewritten = f"{len(written)} files"
+            else:
+                rewritten = ", ".join(written) or "nothing"
+            print(
+                f"Regenerated {changed} of {len(parsed.classes)} classes,"
+                f" rewrote {rewritten} in {time.perf_counter() - start:.2f}s"
+            )
+
+        watch_files(files or [], regenerate, interval)
+        return
+
+    key = make_key()
+    if (
+        cache
+        and stats is None
+        and generation_cache.is_fresh(key)
+        and (not dump_ir or dump_ir.exists())
+    ):
+        return
+    write(parse(), key)
+
+    if stats is not None:
+        for k in CATEGORIES:
+            for name in generation_cache.outputs:
+                if name == f"AstronStubs{k}.py" or name.startswith(f"AstronStubs{k}/"):
+                    stats.add_file(k, out_dir / name)
+        stats.finish()
+        if profile:
+            print(stats.report(top))
+        if stats_json is not None:
+            stats.write_json(stats_json, top)
+
+
+@app.command()
+def analyze(
+    files: Annotated[
+        Optional[List[str]], Argument(help="dc files to analyze")
+    ] = None,
+    parser: Annotated[
+        ParserBackend,
+        Option(help="How to read the dc files: through Panda3D or the built-in parser"),
+    ] = ParserBackend.panda3d,
+    from_ir: Annotated[
+        Optional[pathlib.Path],
+        Option(help="Analyze an IR saved by --dump-ir, without Panda3D"),
+    ] = None,
+    output_format: Annotated[
+        OutputFormat,
+        Option("--format", help="Print the largest fields and classes, or every size as JSON"),
+    ] = OutputFormat.table,
+    top: Annotated[
+        int,
+        Option(min=0, help="Number of broadcast fields and classes in the table"),
+    ] = 20,
 ):
-    parsed = parse_dcfiles(files, set(exclude or []))
+    """Prints the encoded sizes of the fields and the generate messages of the dc classes."""
+    if (from_ir is None) == (not files):
+        raise BadParameter("Exactly one of dc files or --from-ir must be provided")
+    if from_ir is not None:
+        parsed = serialization.load_ir(from_ir)
+    else:
+        assert files is not None
+        read_dcfiles, parse_dcfile = load_parser(parser)
+        parsed = parse_dcfile(read_dcfiles(files), set())
 
-    for k in get_args(Literal["AI", "CL", "UD", "OV"]):
-        out_path = pathlib.Path("astronkit_data", f"AstronStubs{k}.py")
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        dumper = PythonDumper(sys.version_info[:2], k, base_package)
-        with open(out_path, "w") as f:
-            _ = f.write(dumper.dump_file(parsed))
+    report = WireReport(parsed)
+    if output_format == OutputFormat.json:
+        print(report.dump_json())
+    else:
+        print(report.report(top))
 
 
 if __name__ == "__main__":
-    app()
+    app(prog_name="astronkit")
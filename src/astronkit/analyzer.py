@@ -0,0 +1,219 @@
+import dataclasses
+import json
+from typing import Any, Dict, List, Sequence
+
+from astronkit.types import (
+    DCKeyword,
+    DCParameter,
+    DistributedArray,
+    DistributedClass,
+    DistributedFileDef,
+    DistributedMethod,
+    DistributedScaled,
+    DistributedType,
+    DistributedTypeVanilla,
+)
+
+# Strings, blobs and variable-size arrays are prefixed by their length in bytes
+LENGTH_PREFIX = 2
+FIELD_NUMBER = 2
+MAX_LENGTH = 2**16 - 1
+
+
+@dataclasses.dataclass(frozen=True)
+class WireSize:
+    """Bounds of the encoded size of a value, in bytes."""
+
+    minimum: int
+    maximum: int
+
+    @property
+    def fixed(self) -> bool:
+        return self.minimum == self.maximum
+
+    def __add__(self, other: "WireSize") -> "WireSize":
+        return WireSize(self.minimum + other.minimum, self.maximum + other.maximum)
+
+    def __mul__(self, count: int) -> "WireSize":
+        return WireSize(self.minimum * count, self.maximum * count)
+
+
+ZERO = WireSize(0, 0)
+VARIABLE = WireSize(LENGTH_PREFIX, LENGTH_PREFIX + MAX_LENGTH)
+SIZES: Dict[DistributedTypeVanilla, WireSize] = {
+    DistributedTypeVanilla.uint8: WireSize(1, 1),
+    DistributedTypeVanilla.uint16: WireSize(2, 2),
+    DistributedTypeVanilla.uint32: WireSize(4, 4),
+    DistributedTypeVanilla.uint64: WireSize(8, 8),
+    DistributedTypeVanilla.int8: WireSize(1, 1),
+    DistributedTypeVanilla.int16: WireSize(2, 2),
+    DistributedTypeVanilla.int32: WireSize(4, 4),
+    DistributedTypeVanilla.int64: WireSize(8, 8),
+    DistributedTypeVanilla.double: WireSize(8, 8),
+    DistributedTypeVanilla.string: VARIABLE,
+    DistributedTypeVanilla.blob: VARIABLE,
+    DistributedTypeVanilla.largeblob: WireSize(4, 4 + 2**32 - 1),
+    DistributedTypeVanilla.bool_: WireSize(1, 1),
+    DistributedTypeVanilla.char: WireSize(1, 1),
+    DistributedTypeVanilla.null: ZERO,
+}
+
+
+def length_prefixed(typ: DistributedArray) -> bool:
+    """Whether the array starts with its length in bytes.
+
+    Variable-size arrays always do. Fixed-size ones do if their elements vary in size, as
+    Panda3D decides it when reading the dc file: the later dimensions of uint8[2][] are added
+    inside the array once it is built from uint8, so it has no prefix unlike string[2].
+    """
+    if typ.size < 0:
+        return True
+    base: DistributedType = typ.type
+    while isinstance(base, DistributedArray):
+        base = base.type
+    return not type_size(base).fixed
+
+
+def type_size(typ: DistributedType) -> WireSize:
+    if isinstance(typ, DistributedTypeVanilla):
+        return SIZES[typ]
+    elif isinstance(typ, DistributedScaled):
+        return SIZES[typ.type]
+    elif isinstance(typ, DistributedArray):
+        element = type_size(typ.type)
+        if typ.size < 0:
+            # The length limits the bytes of the elements, not their number
+            return WireSize(LENGTH_PREFIX, LENGTH_PREFIX + (MAX_LENGTH if element.maximum else 0))
+        total = element * typ.size
+        if not length_prefixed(typ):
+            return total
+        return WireSize(LENGTH_PREFIX + total.minimum, LENGTH_PREFIX + min(total.maximum, MAX_LENGTH))
+    return params_size(typ.fields)
+
+
+def params_size(params: Sequence[DCParameter]) -> WireSize:
+    size = ZERO
+    for p in params:
+        size += type_size(p.type)
+    return size
+
+
+@dataclasses.dataclass(frozen=True)
+class FieldSize:
+    dclass: str
+    name: str
+    number: int
+    keywords: List[str]
+    minimum: int
+    maximum: int
+    fixed: bool
+
+
+@dataclasses.dataclass(frozen=True)
+class ClassSize:
+    name: str
+    # Including the inherited ones
+    fields: int
+    # Sent by every generate, in field order and without field numbers
+    required_minimum: int
+    required_maximum: int
+    # The ram fields that are not required, when all of them are set: a count, then every field after its number
+    ram_minimum: int
+    ram_maximum: int
+
+
+def field_size(dclass: str, method: DistributedMethod) -> FieldSize:
+    size = params_size(method.parameters)
+    return FieldSize(
+        dclass,
+        method.name,
+        method.number,
+        method.keywords.names(),
+        size.minimum,
+        size.maximum,
+        size.fixed,
+    )
+
+
+def inherited_fields(obj: DistributedClass) -> Dict[str, DistributedMethod]:
+    """The fields of the class by name, fields of a subclass replace the ones of its superclasses."""
+    fields = {method.name: method for method in obj.fields}
+    for sc in obj.superclasses:
+        for name, method in inherited_fields(sc).items():
+            _ = fields.setdefault(name, method)
+    return fields
+
+
+def class_size(obj: DistributedClass) -> ClassSize:
+    fields = inherited_fields(obj)
+    required = ZERO
+    ram = ZERO
+    for method in fields.values():
+        if DCKeyword.required in method.keywords:
+            required += params_size(method.parameters)
+        elif DCKeyword.ram in method.keywords:
+            ram += WireSize(FIELD_NUMBER, FIELD_NUMBER) + params_size(method.parameters)
+    if ram != ZERO:
+        # The number of fields that follow
+        ram += WireSize(2, 2)
+    return ClassSize(
+        obj.name,
+        len(fields),
+        required.minimum,
+        required.maximum,
+        ram.minimum,
+        ram.maximum,
+    )
+
+
+class WireReport:
+    """Encoded sizes of the fields, structs and generates of parsed dc files.
+
+    Sizes follow the Astron wire format: numbers are fixed-size, strings, blobs and
+    variable-size arrays are prefixed by their length in bytes. Ranges declared in the dc
+    files, i.e. string(0-32), are not in the IR, so the maximum of such types is the
+    largest length the prefix allows.
+    """
+
+    def __init__(self, obj: DistributedFileDef) -> None:
+        classes = obj.all_classes()
+        self.fields = [field_size(c.name, m) for c in classes for m in c.fields]
+        self.classes = [class_size(c) for c in classes]
+        self.structs = {s.name: dataclasses.asdict(params_size(s.fields)) for s in obj.structs}
+
+    def broadcast_fields(self) -> List[FieldSize]:
+        """The broadcast fields, largest first, since every update is sent to every interested client."""
+        fields = [f for f in self.fields if "broadcast" in f.keywords]
+        return sorted(fields, key=lambda f: (f.maximum, f.minimum), reverse=True)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "fields": [dataclasses.asdict(f) for f in self.fields],
+            "classes": [dataclasses.asdict(c) for c in self.classes],
+            "structs": self.structs,
+            "broadcast": [f"{f.dclass}.{f.name}" for f in self.broadcast_fields()],
+        }
+
+    def dump_json(self) -> str:
+        return json.dumps(self.to_json(), indent=2)
+
+    def report(self, top: int) -> str:
+        fields = self.broadcast_fields()
+        rows = [f"Top {min(top, len(fields))} of {len(fields)} broadcast fields by maximum size"]
+        rows.append("    Number  Field                                       Min          Max")
+        for f in fields[:top]:
+            name = f"{f.dclass}.{f.name}"
+            rows.append(f"{f.number:>10}  {name:<40} {f.minimum:>6} {f.maximum:>12,}")
+        classes = sorted(
+            self.classes, key=lambda c: (c.required_maximum, c.required_minimum), reverse=True
+        )
+        rows += ["", f"Top {min(top, len(classes))} of {len(classes)} classes by maximum generate size"]
+        rows.append("Class                               Fields  Required min-max         Ram min-max")
+        for c in classes[:top]:
+            rows.append(
+                f"{c.name:<35} {c.fields:>6} {c.required_minimum:>8}-{c.required_maximum:<12,}"
+                f" {c.ram_minimum:>6}-{c.ram_maximum:,}"
+            )
+        fixed = sum(f.fixed for f in self.fields)
+        rows += ["", f"{fixed} of {len(self.fields)} fields have a fixed size"]
+        return "\n".join(rows)
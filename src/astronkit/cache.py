@@ -0,0 +1,128 @@
+import contextlib
+import filecmp
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+from importlib import metadata
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, TextIO, Tuple, Union
+
+CACHE_NAME = ".astronkit_cache.json"
+
+
+def get_astronkit_version() -> str:
+    try:
+        return metadata.version("astronkit")
+    except metadata.PackageNotFoundError:
+        # Running from a source checkout without installing
+        return "unknown"
+
+
+def _get_umask() -> int:
+    umask = os.umask(0)
+    _ = os.umask(umask)
+    return umask
+
+
+def hash_file(path: Union[str, pathlib.Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_key(
+    files: Sequence[Union[str, pathlib.Path]],
+    options: Mapping[str, object],
+    target_version: Tuple[int, int],
+) -> str:
+    # The order of the files matters, as it determines the order of the generated classes
+    digest = hashlib.sha256()
+    header = {
+        "astronkit": get_astronkit_version(),
+        "target_version": list(target_version),
+        "options": options,
+    }
+    digest.update(json.dumps(header, sort_keys=True).encode())
+    for f in files:
+        digest.update(str(f).encode() + b"\0")
+        digest.update(hash_file(f).encode())
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    def __init__(self, directory: pathlib.Path) -> None:
+        self.directory = directory
+        self.path = directory / CACHE_NAME
+        self.key: Optional[str] = None
+        self.outputs: Dict[str, str] = {}
+        # Outputs produced during this run, and those that were actually rewritten
+        self.produced: Dict[str, str] = {}
+        self.written: List[str] = []
+
+        try:
+            data = json.loads(self.path.read_text())
+            self.key = data["key"]
+            self.outputs = data["outputs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def is_fresh(self, key: str) -> bool:
+        # Outputs are checked too, so that deleting or editing them triggers a regeneration
+        if key != self.key or not self.outputs:
+            return False
+        for name, digest in self.outputs.items():
+            try:
+                if hash_file(self.directory / name) != digest:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @contextlib.contextmanager
+    def open_output(self, name: str) -> Iterator[TextIO]:
+        """Opens a temporary file that replaces the output once closed, unless they have the same content."""
+        path = self.directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with open(fd, "w", newline="") as f:
+                yield f
+            self.produced[name] = hash_file(tmp)
+            if path.exists() and filecmp.cmp(tmp, path, shallow=False):
+                os.remove(tmp)
+            else:
+                # mkstemp creates private files, outputs should get the usual permissions
+                os.chmod(tmp, 0o666 & ~_get_umask())
+                os.replace(tmp, path)
+                self.written.append(name)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def write_output(self, name: str, content: str) -> None:
+        with self.open_output(name) as f:
+            _ = f.write(content)
+
+    def remove_stale(self) -> None:
+        """Removes the outputs of the previous run that were not produced by this one."""
+        for name in self.outputs.keys() - self.produced.keys():
+            path = self.directory / name
+            with contextlib.suppress(OSError):
+                path.unlink()
+            if path.parent != self.directory:
+                # Only succeeds once the package is empty
+                with contextlib.suppress(OSError):
+                    path.parent.rmdir()
+
+    def save(self, key: str) -> None:
+        self.remove_stale()
+        self.key = key
+        self.outputs = self.produced
+        self.produced = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _ = self.path.write_text(
+            json.dumps({"key": key, "outputs": self.outputs}, indent=2, sort_keys=True)
+        )
@@ -0,0 +1,238 @@
+import struct
+from typing import Dict, List, Optional, Sequence, Set
+
+from astronkit.types import (
+    DCParameter,
+    DistributedArray,
+    DistributedFileDef,
+    DistributedScaled,
+    DistributedType,
+    DistributedTypeVanilla,
+)
+
+# struct formats of the types that always take the same number of bytes, datagrams are little endian
+FORMATS: Dict[DistributedTypeVanilla, str] = {
+    DistributedTypeVanilla.uint8: "B",
+    DistributedTypeVanilla.uint16: "H",
+    DistributedTypeVanilla.uint32: "I",
+    DistributedTypeVanilla.uint64: "Q",
+    DistributedTypeVanilla.int8: "b",
+    DistributedTypeVanilla.int16: "h",
+    DistributedTypeVanilla.int32: "i",
+    DistributedTypeVanilla.int64: "q",
+    DistributedTypeVanilla.double: "d",
+    # A typedef of uint8
+    DistributedTypeVanilla.bool_: "B",
+}
+
+HEADER = '''\
+"""struct codecs for the fixed-size fields and structs of the dc files.
+
+FIELDS is keyed by field number and STRUCTS by struct name. pack_field and unpack_field
+use them when they can and fall back to Panda3D's DCPacker for variable-size fields.
+Value ranges declared in the dc files are not checked by the codecs.
+"""
+
+import struct
+from math import floor
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+from panda3d.direct import DCPacker
+
+
+class Codec(NamedTuple):
+    size: int
+    # Takes the arguments of the field, or the fields of the struct
+    pack: Callable[[Any], bytes]
+    # Takes the data and an optional offset into it
+    unpack: Callable[..., Any]
+
+
+def pack_field(field: Any, value: Any) -> bytes:
+    """The arguments of a DCField, as they follow the field number in an update."""
+    codec = FIELDS.get(field.getNumber())
+    if codec is not None:
+        return codec.pack(value)
+    packer = DCPacker()
+    packer.beginPack(field)
+    field.packArgs(packer, value)
+    if not packer.endPack():
+        raise ValueError(f"Unable to pack {field.getName()}: {value!r}")
+    return packer.getBytes()
+
+
+def unpack_field(field: Any, data: bytes, offset: int = 0) -> Tuple[Any, int]:
+    """The arguments of a DCField read from data, and the offset that follows them."""
+    codec = FIELDS.get(field.getNumber())
+    if codec is not None:
+        return codec.unpack(data, offset), offset + codec.size
+    packer = DCPacker()
+    packer.setUnpackData(data[offset:])
+    packer.beginUnpack(field)
+    args = field.unpackArgs(packer)
+    if not packer.endUnpack():
+        raise ValueError(f"Unable to unpack {field.getName()}")
+    return args, offset + packer.getNumUnpackedBytes()
+'''
+
+
+def make_tuple(items: Sequence[str]) -> str:
+    if len(items) == 1:
+        return f"({items[0]},)"
+    return "(" + ", ".join(items) + ")"
+
+
+class CodecDumper:
+    """Dumps a module of precompiled struct.Struct codecs, in the same order as the dc files.
+
+    Every codec packs with a single struct call. Scaled numbers are converted like Panda3D
+    does, and nested structs and fixed-size arrays are rebuilt as tuples and lists.
+    """
+
+    def __init__(self) -> None:
+        # Variable name of every format, codecs with the same layout share one struct.Struct
+        self.formats: Dict[str, str] = {}
+        self.names: Set[str] = set()
+        self.functions: List[str] = []
+
+    def get_format(self, typ: DistributedType) -> Optional[str]:
+        """The struct format of the type, None if its size is variable."""
+        if isinstance(typ, DistributedTypeVanilla):
+            return FORMATS.get(typ)
+        elif isinstance(typ, DistributedScaled):
+            return FORMATS.get(typ.type)
+        elif isinstance(typ, DistributedArray):
+            element = self.get_format(typ.type)
+            if typ.size < 0 or element is None:
+                return None
+            return element * typ.size
+        return self.get_params_format(typ.fields)
+
+    def get_params_format(self, params: Sequence[DCParameter]) -> Optional[str]:
+        formats: List[str] = []
+        for p in params:
+            if (fmt := self.get_format(p.type)) is None:
+                return None
+            formats.append(fmt)
+        return "".join(formats)
+
+    def pack_scaled(self, typ: DistributedScaled, expr: str) -> str:
+        # The modulus is applied before the divisor, and integers are rounded half up
+        if typ.modulus:
+            expr = f"{expr} % {typ.modulus!r}"
+        if typ.divisor > 1:
+            expr = f"({expr}) * {typ.divisor}" if typ.modulus else f"{expr} * {typ.divisor}"
+        if typ.type == DistributedTypeVanilla.double:
+            return expr
+        return f"floor({expr} + 0.5)"
+
+    def unpack_scaled(self, typ: DistributedScaled, expr: str) -> str:
+        if typ.divisor > 1:
+            return f"{expr} / {typ.divisor}"
+        return expr
+
+    def pack_args(self, typ: DistributedType, expr: str) -> List[str]:
+        """The arguments of struct.pack for a value of the type."""
+        if isinstance(typ, DistributedTypeVanilla):
+            return [expr]
+        elif isinstance(typ, DistributedScaled):
+            return [self.pack_scaled(typ, expr)]
+        elif isinstance(typ, DistributedArray):
+            if isinstance(typ.type, DistributedTypeVanilla):
+                return [f"*{expr}"]
+            elif isinstance(typ.type, DistributedScaled):
+                return [f"*[{self.pack_scaled(typ.type, 'x')} for x in {expr}]"]
+            args: List[str] = []
+            for i in range(typ.size):
+                args += self.pack_args(typ.type, f"{expr}[{i}]")
+            return args
+        return self.pack_params(typ.fields, expr)
+
+    def pack_params(self, params: Sequence[DCParameter], expr: str) -> List[str]:
+        args: List[str] = []
+        for i, p in enumerate(params):
+            args += self.pack_args(p.type, f"{expr}[{i}]")
+        return args
+
+    def unpack_value(self, typ: DistributedType, index: List[int]) -> str:
+        """The expression rebuilding a value of the type from f, the unpacked tuple."""
+        start = index[0]
+        if isinstance(typ, DistributedTypeVanilla):
+            index[0] += 1
+            return f"f[{start}]"
+        elif isinstance(typ, DistributedScaled):
+            index[0] += 1
+            return self.unpack_scaled(typ, f"f[{start}]")
+        elif isinstance(typ, DistributedArray):
+            if isinstance(typ.type, DistributedTypeVanilla):
+                index[0] += typ.size
+                return f"list(f[{start}:{index[0]}])"
+            elif isinstance(typ.type, DistributedScaled):
+                index[0] += typ.size
+                return f"[{self.unpack_scaled(typ.type, 'x')} for x in f[{start}:{index[0]}]]"
+            return "[" + ", ".join(self.unpack_value(typ.type, index) for _ in range(typ.size)) + "]"
+        return self.unpack_params(typ.fields, index)
+
+    def unpack_params(self, params: Sequence[DCParameter], index: List[int]) -> str:
+        return make_tuple([self.unpack_value(p.type, index) for p in params])
+
+    def get_struct(self, fmt: str) -> str:
+        if (name := self.formats.get(fmt)) is None:
+            name = self.formats[fmt] = f"_s{len(self.formats)}"
+        return name
+
+    def get_name(self, name: str, number: int) -> str:
+        if name in self.names:
+            name = f"{name}_{number}"
+        self.names.add(name)
+        return name
+
+    def dump_codec(self, name: str, fmt: str, params: Sequence[DCParameter]) -> str:
+        """Defines the functions of a codec, and returns its Codec(...) expression."""
+        s = self.get_struct(fmt)
+        args = self.pack_params(params, "value")
+        index = [0]
+        value = self.unpack_params(params, index)
+        flat = args == [f"value[{i}]" for i in range(len(params))]
+        rows = [
+            f"def _pack_{name}(value: Any) -> bytes:",
+            f"    return {s}.pack(*value)" if flat else f"    return {s}.pack({', '.join(args)})",
+        ]
+        unpack = f"{s}.unpack_from"
+        if not flat:
+            # Flat codecs unpack with the struct's own method, without a Python frame
+            unpack = f"_unpack_{name}"
+            rows += [
+                "",
+                "",
+                f"def _unpack_{name}(data: bytes, offset: int = 0) -> Any:",
+                f"    f = {s}.unpack_from(data, offset)",
+                f"    return {value}",
+            ]
+        self.functions.append("\n".join(rows))
+        return f"Codec({struct.calcsize('<' + fmt)}, _pack_{name}, {unpack})"
+
+    def dump_file(self, obj: DistributedFileDef) -> str:
+        structs: List[str] = []
+        for s in obj.structs:
+            if (fmt := self.get_params_format(s.fields)) is not None:
+                codec = self.dump_codec(self.get_name(f"struct_{s.name}", 0), fmt, s.fields)
+                structs.append(f'    "{s.name}": {codec},')
+        fields: List[str] = []
+        numbers: Set[int] = set()
+        for c in obj.all_classes():
+            for m in c.fields:
+                if m.number in numbers:
+                    continue
+                numbers.add(m.number)
+                if (fmt := self.get_params_format(m.parameters)) is not None:
+                    name = self.get_name(f"{c.name}_{m.name}", m.number)
+                    fields.append(f"    {m.number}: {self.dump_codec(name, fmt, m.parameters)},")
+
+        rows = [HEADER]
+        rows += [f'{name} = struct.Struct("<{fmt}")' for fmt, name in self.formats.items()]
+        rows += ["", ""]
+        rows += [f + "\n\n" for f in self.functions]
+        rows += ["STRUCTS: Dict[str, Codec] = {", *structs, "}"]
+        rows += ["FIELDS: Dict[int, Codec] = {", *fields, "}"]
+        return "\n".join(rows) + "\n"
@@ -0,0 +1,83 @@
+COUNTERS_MODULE = "AstronCounters"
+
+COUNTERS_SOURCE = '''\
+"""Counters of the updates sent and received through the stubs, by category, class and field.
+
+Counting doesn't take a lock: the counters are plain lists in a dict, and reset swaps
+the dict. An update counted by another thread while reset runs may be missing from both
+snapshots, which is fine for profiling.
+"""
+
+import functools
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+CounterKey = Tuple[str, str, str]
+
+
+class FieldCounter(NamedTuple):
+    sent: int
+    # Bytes of the arguments, without the headers of the datagrams
+    sent_bytes: int
+    received: int
+    # Only known when the updates are received through dispatch_update
+    received_bytes: int
+
+
+# [sent, sent bytes, received, received bytes] by (category, class name, field name)
+_counters: Dict[CounterKey, List[int]] = {}
+
+
+def _get_counter(category: str, obj: Any, field: str) -> List[int]:
+    key = (category, type(obj).__name__, field)
+    counter = _counters.get(key)
+    if counter is None:
+        counter = _counters.setdefault(key, [0, 0, 0, 0])
+    return counter
+
+
+def count_sent(category: str, obj: Any, field: str, size: int) -> None:
+    counter = _get_counter(category, obj, field)
+    counter[0] += 1
+    counter[1] += size
+
+
+def count_received(category: str, obj: Any, field: str, size: int) -> None:
+    counter = _get_counter(category, obj, field)
+    counter[2] += 1
+    counter[3] += size
+
+
+def _counted(category: str, name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(method)
+    def receiver(self: Any, *args: Any) -> Any:
+        # Overrides calling super() are only counted once, by the most derived receiver
+        if getattr(type(self), name) is receiver:
+            count_received(category, self, name, 0)
+        return method(self, *args)
+
+    receiver._counted = True  # type: ignore[attr-defined]
+    return receiver
+
+
+def count_receivers(cls: Any, category: str, names: Iterable[str]) -> None:
+    """Wraps the receivers implemented by cls, called when a stub is subclassed."""
+    for name in names:
+        method = cls.__dict__.get(name)
+        if (
+            callable(method)
+            and not getattr(method, "__isabstractmethod__", False)
+            and not getattr(method, "_counted", False)
+        ):
+            setattr(cls, name, _counted(category, name, method))
+
+
+def snapshot() -> Dict[CounterKey, FieldCounter]:
+    return {key: FieldCounter(*counter) for key, counter in list(_counters.items())}
+
+
+def reset() -> Dict[CounterKey, FieldCounter]:
+    """Starts counting over, and returns the counters up to now."""
+    global _counters
+    counters, _counters = _counters, {}
+    return {key: FieldCounter(*counter) for key, counter in counters.items()}
+'''
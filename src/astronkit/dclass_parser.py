@@ -1,6 +1,11 @@
-from collections.abc import Collection
 import pathlib
-from typing import List, Literal, Set, Union
+from typing import Collection, Dict, List, Optional, Set, Union
+from astronkit.parser_common import (
+    build_file_def,
+    class_visibility,
+    expand_import_symbol,
+    uint32uint8,
+)
 from astronkit.types import (
     DCKeyword,
     DCParameter,
@@ -11,19 +16,11 @@ from astronkit.types import (
     DistributedStruct,
     DistributedType,
     DistributedTypeVanilla,
+    TypeTable,
 )
 import panda3d.direct as types
 from panda3d.direct import DCClass, DCField, DCFile
 
-
-uint32uint8 = DistributedStruct(
-    "uint32uint8",
-    [
-        DCParameter(None, DistributedTypeVanilla.uint32, False),
-        DCParameter(None, DistributedTypeVanilla.uint8, False),
-    ],
-)
-
 subatomic_to_dctypes = {
     types.ST_int8: DistributedTypeVanilla.int8,
     types.ST_int16: DistributedTypeVanilla.int16,
@@ -38,22 +35,22 @@ subatomic_to_dctypes = {
     types.ST_blob: DistributedTypeVanilla.blob,
     types.ST_blob32: DistributedTypeVanilla.largeblob,
     types.ST_char: DistributedTypeVanilla.char,
-    types.ST_int8array: DistributedArray(DistributedTypeVanilla.int8),
-    types.ST_int16array: DistributedArray(DistributedTypeVanilla.int16),
-    types.ST_int32array: DistributedArray(DistributedTypeVanilla.int32),
-    types.ST_uint8array: DistributedArray(DistributedTypeVanilla.uint8),
-    types.ST_uint16array: DistributedArray(DistributedTypeVanilla.uint16),
-    types.ST_uint32array: DistributedArray(DistributedTypeVanilla.uint32),
-    types.ST_uint32uint8array: DistributedArray(uint32uint8),
+    types.ST_int8array: DistributedArray(DistributedTypeVanilla.int8, -1),
+    types.ST_int16array: DistributedArray(DistributedTypeVanilla.int16, -1),
+    types.ST_int32array: DistributedArray(DistributedTypeVanilla.int32, -1),
+    types.ST_uint8array: DistributedArray(DistributedTypeVanilla.uint8, -1),
+    types.ST_uint16array: DistributedArray(DistributedTypeVanilla.uint16, -1),
+    types.ST_uint32array: DistributedArray(DistributedTypeVanilla.uint32, -1),
+    types.ST_uint32uint8array: DistributedArray(uint32uint8, -1),
 }
 
 
-def parse_type(param: types.DCParameter) -> DistributedType:
+def parse_type(param: types.DCParameter, table: TypeTable) -> DistributedType:
     if struct := param.as_class_parameter():
-        return parse_struct(struct.get_class())
+        return parse_struct(struct.get_class(), table)
     elif array := param.as_array_parameter():
-        return DistributedArray(
-            parse_type(array.get_element_type()), array.get_array_size()
+        return table.array(
+            parse_type(array.get_element_type(), table), array.get_array_size()
         )
     elif simple := param.as_simple_parameter():
         if (typedef := simple.get_typedef()) and "bool" in typedef.get_name():
@@ -62,31 +59,40 @@ def parse_type(param: types.DCParameter) -> DistributedType:
             return DistributedTypeVanilla.bool_
         if simple.get_type() == types.ST_invalid:
             raise ValueError(f"Parameter {param} is invalid!")
-        if simple.get_divisor() > 1:
+        base = subatomic_to_dctypes[simple.get_type()]
+        divisor = simple.get_divisor()
+        modulus = simple.get_modulus() if simple.has_modulus() else 0.0
+        if isinstance(base, DistributedTypeVanilla) and (divisor > 1 or modulus):
+            return table.scale(base, divisor, modulus)
+        if divisor > 1:
             return DistributedTypeVanilla.double
-        return subatomic_to_dctypes[simple.get_type()]
+        return base
     else:
         raise ValueError(
             f"Parameter {param.get_class().get_name()}::{param.get_name()} could not be parsed!"
         )
 
 
-def parse_param(dcfield: DCField) -> List[DCParameter]:
+def parse_param(dcfield: DCField, table: TypeTable) -> List[DCParameter]:
     parameters: list[DCParameter] = []
     if atomic := dcfield.as_atomic_field():
         for i in range(atomic.get_num_elements()):
             elt = atomic.get_element(i)
             parameters.append(
-                DCParameter(elt.get_name(), parse_type(elt), elt.has_default_value())
+                table.parameter(
+                    elt.get_name(), parse_type(elt, table), elt.has_default_value()
+                )
             )
         return parameters
     elif molecular := dcfield.as_molecular_field():
         for i in range(molecular.get_num_atomics()):
-            parameters.extend(parse_param(molecular.get_atomic(i)))
+            parameters.extend(parse_param(molecular.get_atomic(i), table))
         return parameters
     elif param := dcfield.as_parameter():
         return [
-            DCParameter(param.get_name(), parse_type(param), param.has_default_value())
+            table.parameter(
+                param.get_name(), parse_type(param, table), param.has_default_value()
+            )
         ]
     else:
         raise ValueError(
@@ -94,85 +100,91 @@ def parse_param(dcfield: DCField) -> List[DCParameter]:
         )
 
 
-def parse_method(dcfield: DCField) -> DistributedMethod:
-    params = parse_param(dcfield)
-    keywords: list[DCKeyword] = []
-    for i in range(dcfield.get_num_keywords()):
-        keyword = dcfield.get_keyword(i).get_name()
-        keywords.append(DCKeyword(keyword))
-    return DistributedMethod(dcfield.get_name(), params, keywords)
+def parse_method(dcfield: DCField, table: TypeTable) -> DistributedMethod:
+    params = parse_param(dcfield, table)
+    keywords = DCKeyword.parse(
+        dcfield.get_keyword(i).get_name() for i in range(dcfield.get_num_keywords())
+    )
+    return DistributedMethod(
+        dcfield.get_name(), tuple(params), keywords, dcfield.get_number()
+    )
 
 
-def parse_struct(dcclass: DCClass) -> DistributedStruct:
+def parse_struct(dcclass: DCClass, table: TypeTable) -> DistributedStruct:
+    # Every use of a struct refers to the same instance
+    if (struct := table.structs.get(dcclass.get_name())) is not None:
+        return struct
     fields: list[DCParameter] = []
     for i in range(dcclass.get_num_fields()):
-        fields.extend(parse_param(dcclass.get_field(i)))
-    return DistributedStruct(dcclass.get_name(), fields)
+        fields.extend(parse_param(dcclass.get_field(i), table))
+    struct = table.structs[dcclass.get_name()] = DistributedStruct(
+        dcclass.get_name(), tuple(fields)
+    )
+    return struct
+
+
+ClassRegistry = Dict[int, DistributedClass]
+
+
+def parse_class(
+    classnames: Collection[str],
+    dcclass: DCClass,
+    registry: Optional[ClassRegistry] = None,
+    table: Optional[TypeTable] = None,
+) -> DistributedClass:
+    # Classes are memoized by their DCClass number, so a parent shared by many subclasses
+    # is parsed once and every subclass references the same instance
+    if registry is None:
+        registry = {}
+    if table is None:
+        table = TypeTable()
+    if (number := dcclass.get_number()) in registry:
+        return registry[number]
 
-
-def parse_class(classnames: Collection[str], dcclass: DCClass) -> DistributedClass:
     parents: list[DistributedClass] = []
     fields: list[DistributedMethod] = []
     for i in range(dcclass.get_num_parents()):
-        parents.append(parse_class(classnames, dcclass.get_parent(i)))
+        parents.append(parse_class(classnames, dcclass.get_parent(i), registry, table))
     for i in range(dcclass.get_num_fields()):
-        fields.append(parse_method(dcclass.get_field(i)))
-
-    visibility: Set[Literal["AI", "OV", "UD", "CL"]] = set()
-    if dcclass.get_name() + "AI" in classnames:
-        visibility.add("AI")
-    if dcclass.get_name() + "UD" in classnames:
-        visibility.add("UD")
-    if dcclass.get_name() in classnames:
-        visibility.add("CL")
-    if any(
-        DCKeyword.ownrecv in x.keywords or DCKeyword.ownsend in x.keywords
-        for x in fields
-    ):
-        # OwnerView does not have its own class type, so we assume
-        # that anything that cares about the owner has an ownerview and nothing else
-        visibility.add("OV")
-    return DistributedClass(dcclass.get_name(), parents, visibility, fields)
+        fields.append(parse_method(dcclass.get_field(i), table))
+
+    visibility = class_visibility(dcclass.get_name(), classnames, fields)
+    registry[number] = DistributedClass(
+        dcclass.get_name(), tuple(parents), visibility, tuple(fields)
+    )
+    return registry[number]
 
 
 def parse_dcfile(dcfile: DCFile, exclusions: Collection[str]) -> DistributedFileDef:
     classes: list[DistributedClass] = []
     structs: list[DistributedStruct] = []
     classnames: Set[str] = set()
+    registry: ClassRegistry = {}
+    table = TypeTable()
 
     for i in range(dcfile.get_num_import_modules()):
         for j in range(dcfile.get_num_import_symbols(i)):
-            symbols = dcfile.get_import_symbol(i, j).split("/")
-            symbols = [symbols[0]] + [symbols[0] + x for x in symbols[1:]]
-            classnames |= set(symbols)
+            classnames |= set(expand_import_symbol(dcfile.get_import_symbol(i, j)))
 
     for i in range(dcfile.get_num_classes()):
         cls = dcfile.get_class(i)
         if cls.is_struct():
-            structs.append(parse_struct(cls))
-        else:
-            classes.append(parse_class(classnames, cls))
-
-    # Make sure that superclasses are in the OV file, mainly
-    classes_dict = {x.name: x for x in classes}
-    for e in exclusions:
-        if (suffix := e[-2:]) in ("OV", "AI", "UD"):
-            e = e[:-2]
+            structs.append(parse_struct(cls, table))
         else:
-            suffix = "CL"
-        classes_dict[e].visibility.discard(suffix)
-    for f in classes:
-        for g in f.superclasses:
-            classes_dict[g.name].visibility.update(f.visibility)
+            classes.append(parse_class(classnames, cls, registry, table))
 
-    return DistributedFileDef(list(classes_dict.values()), structs)
+    return build_file_def(classes, structs, exclusions)
 
 
-def parse_dcfiles(
-    dcfiles: Collection[Union[str, pathlib.Path]], exclusions: Collection[str]
-) -> DistributedFileDef:
+def read_dcfiles(dcfiles: Collection[Union[str, pathlib.Path]]) -> DCFile:
     dcfile = DCFile()
     for f in dcfiles:
         if not dcfile.read(f):
             raise ValueError(f"Unable to read dcfile: {f}")
-    return parse_dcfile(dcfile, exclusions)
+    return dcfile
+
+
+def parse_dcfiles(
+    dcfiles: Collection[Union[str, pathlib.Path]], exclusions: Collection[str]
+) -> DistributedFileDef:
+    return parse_dcfile(read_dcfiles(dcfiles), exclusions)
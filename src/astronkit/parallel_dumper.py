@@ -0,0 +1,181 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterator, List, Mapping, Optional, Set, TextIO, Tuple
+
+from astronkit.python_dumper import (
+    AliasDefinitions,
+    Category,
+    DumperOptions,
+    PythonDumper,
+    RenderCache,
+    StubBody,
+    TupleAliases,
+    Variant,
+)
+from astronkit.stats import ClassStats, GenerationStats
+from astronkit.types import DistributedFileDef
+
+# State of a worker process, set up once by _init_worker so that the file
+# is only sent to each worker once rather than with every chunk
+_worker_file: Optional[DistributedFileDef] = None
+_worker_dumpers: Dict[Category, PythonDumper] = {}
+
+
+def _init_worker(
+    obj: DistributedFileDef,
+    target_version: Tuple[int, int],
+    categories: List[Category],
+    distributed_package: str,
+    options: Optional[DumperOptions],
+    collect_stats: bool,
+    variant: Variant,
+) -> None:
+    global _worker_file
+    _worker_file = obj
+    type_cache: RenderCache[str] = {}
+    aliases = TupleAliases()
+    for k in categories:
+        _worker_dumpers[k] = PythonDumper(
+            target_version, k, distributed_package, options, type_cache, aliases, variant
+        )
+        if collect_stats:
+            _worker_dumpers[k].class_stats = []
+
+
+ChunkResult = Tuple[List[str], Set[str], AliasDefinitions, List[ClassStats]]
+
+
+def _dump_chunk(category: Category, start: int, end: int) -> ChunkResult:
+    assert _worker_file is not None
+    # The dumper is reused between chunks to keep its caches warm,
+    # memoized renderings add their symbols back on every use
+    dumper = _worker_dumpers[category]
+    dumper.name_aliases(_worker_file)
+    dumper.symbols = set()
+    class_stats: List[ClassStats] = []
+    if dumper.class_stats is not None:
+        dumper.class_stats = class_stats
+    classes = [
+        dumper.dump_class(c)
+        for c in _worker_file.classes[start:end]
+        if dumper.visible(c)
+    ]
+    # Every worker names the aliases of the whole file the same way, so the chunks can't disagree on them
+    aliases = {name: dumper.aliases.definitions[name] for name in dumper.alias_names()}
+    return classes, dumper.symbols, aliases, class_stats
+
+
+class ParallelDumper:
+    """Dumps several categories on a process pool, split in chunks of classes.
+
+    Every class is dumped independently, and the import symbols of the chunks are merged
+    afterwards. Since the imports are sorted, the output is identical to MultiDumper's.
+    """
+
+    def __init__(
+        self,
+        target_version: Tuple[int, int],
+        categories: List[Category],
+        distributed_package: str,
+        jobs: int,
+        options: Optional[DumperOptions] = None,
+        stats: Optional[GenerationStats] = None,
+        variant: Variant = "module",
+    ) -> None:
+        self.target_version = target_version
+        self.categories = categories
+        self.distributed_package = distributed_package
+        self.jobs = jobs
+        self.options = options
+        self.stats = stats
+        self.variant: Variant = variant
+
+    def iter_chunks(
+        self, obj: DistributedFileDef
+    ) -> Iterator[Tuple[Category, List[str], Set[str], AliasDefinitions]]:
+        """Yields the dumped chunks of classes, in file order for every category."""
+        # A few chunks per worker, so that a slow chunk doesn't hold up the pool
+        chunk_size = max(1, -(-len(obj.classes) // (self.jobs * 4)))
+        tasks = iter(
+            [
+                (k, start, min(start + chunk_size, len(obj.classes)))
+                for k in self.categories
+                for start in range(0, len(obj.classes), chunk_size)
+            ]
+        )
+
+        with ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_worker,
+            initargs=(
+                obj,
+                self.target_version,
+                self.categories,
+                self.distributed_package,
+                self.options,
+                self.stats is not None,
+                self.variant,
+            ),
+        ) as pool:
+            pending: Deque[Tuple[Category, Future[ChunkResult]]] = deque()
+
+            def submit_next() -> None:
+                if (task := next(tasks, None)) is not None:
+                    pending.append((task[0], pool.submit(_dump_chunk, *task)))
+
+            # Only a few chunks are in flight, so that finished ones don't pile up in memory
+            for _ in range(self.jobs * 2):
+                submit_next()
+            # Results are collected in submission order, which keeps the classes in file order
+            while pending:
+                k, future = pending.popleft()
+                dumped, symbols, aliases, class_stats = future.result()
+                if self.stats is not None:
+                    self.stats.classes.extend(class_stats)
+                submit_next()
+                yield k, dumped, symbols, aliases
+
+    def make_dumpers(self) -> Dict[Category, PythonDumper]:
+        # These only dump the structs and the imports, which merge the symbols of every chunk
+        return {
+            k: PythonDumper(
+                self.target_version,
+                k,
+                self.distributed_package,
+                self.options,
+                variant=self.variant,
+            )
+            for k in self.categories
+        }
+
+    def dump_files(self, obj: DistributedFileDef) -> Dict[Category, str]:
+        dumpers = self.make_dumpers()
+        classes: Dict[Category, List[str]] = {k: [] for k in self.categories}
+        for k, dumped, symbols, aliases in self.iter_chunks(obj):
+            classes[k].extend(dumped)
+            dumpers[k].symbols |= symbols
+            dumpers[k].aliases.definitions.update(aliases)
+
+        return {
+            k: d.join_file([d.dump_struct(s) for s in obj.structs], classes[k])
+            for k, d in dumpers.items()
+        }
+
+    def dump_bodies(self, obj: DistributedFileDef) -> Dict[Category, Tuple[str, StubBody]]:
+        """The header and the spooled body of every file, only keeps a chunk of classes in memory at a time."""
+        dumpers = self.make_dumpers()
+        bodies = {
+            k: StubBody([d.dump_struct(s) for s in obj.structs])
+            for k, d in dumpers.items()
+        }
+        for k, dumped, symbols, aliases in self.iter_chunks(obj):
+            for text in dumped:
+                bodies[k].add_class(text)
+            dumpers[k].symbols |= symbols
+            dumpers[k].aliases.definitions.update(aliases)
+        return {k: (d.dump_header(), bodies[k]) for k, d in dumpers.items()}
+
+    def write_files(self, obj: DistributedFileDef, fps: Mapping[Category, TextIO]) -> None:
+        """Same as dump_files, but only keeps a chunk of classes in memory at a time."""
+        for k, (header, body) in self.dump_bodies(obj).items():
+            body.write_to(header, fps[k])
@@ -0,0 +1,103 @@
+from typing import Collection, Dict, List, Literal, Sequence, Set
+
+from astronkit.types import (
+    DCKeyword,
+    DCParameter,
+    DistributedArray,
+    DistributedClass,
+    DistributedFileDef,
+    DistributedMethod,
+    DistributedStruct,
+    DistributedType,
+    DistributedTypeVanilla,
+)
+
+# Helpers shared by the Panda3D and the pure-Python dc parser backends.
+# This module must not import panda3d.
+
+uint32uint8 = DistributedStruct(
+    "uint32uint8",
+    (
+        DCParameter(None, DistributedTypeVanilla.uint32, False),
+        DCParameter(None, DistributedTypeVanilla.uint8, False),
+    ),
+)
+
+basic_types: Dict[str, DistributedType] = {
+    "int8": DistributedTypeVanilla.int8,
+    "int16": DistributedTypeVanilla.int16,
+    "int32": DistributedTypeVanilla.int32,
+    "int64": DistributedTypeVanilla.int64,
+    "uint8": DistributedTypeVanilla.uint8,
+    "uint16": DistributedTypeVanilla.uint16,
+    "uint32": DistributedTypeVanilla.uint32,
+    "uint64": DistributedTypeVanilla.uint64,
+    "float64": DistributedTypeVanilla.double,
+    "string": DistributedTypeVanilla.string,
+    "blob": DistributedTypeVanilla.blob,
+    "blob32": DistributedTypeVanilla.largeblob,
+    "char": DistributedTypeVanilla.char,
+    "int8array": DistributedArray(DistributedTypeVanilla.int8, -1),
+    "int16array": DistributedArray(DistributedTypeVanilla.int16, -1),
+    "int32array": DistributedArray(DistributedTypeVanilla.int32, -1),
+    "uint8array": DistributedArray(DistributedTypeVanilla.uint8, -1),
+    "uint16array": DistributedArray(DistributedTypeVanilla.uint16, -1),
+    "uint32array": DistributedArray(DistributedTypeVanilla.uint32, -1),
+    "uint32uint8array": DistributedArray(uint32uint8, -1),
+}
+
+
+def expand_import_symbol(symbol: str) -> List[str]:
+    # DistributedFoo/AI/UD declares DistributedFoo, DistributedFooAI and DistributedFooUD
+    symbols = symbol.split("/")
+    return [symbols[0]] + [symbols[0] + x for x in symbols[1:]]
+
+
+def class_visibility(
+    name: str, classnames: Collection[str], fields: Sequence[DistributedMethod]
+) -> Set[Literal["AI", "OV", "UD", "CL"]]:
+    visibility: Set[Literal["AI", "OV", "UD", "CL"]] = set()
+    if name + "AI" in classnames:
+        visibility.add("AI")
+    if name + "UD" in classnames:
+        visibility.add("UD")
+    if name in classnames:
+        visibility.add("CL")
+    if any(
+        DCKeyword.ownrecv in x.keywords or DCKeyword.ownsend in x.keywords
+        for x in fields
+    ):
+        # OwnerView does not have its own class type, so we assume
+        # that anything that cares about the owner has an ownerview and nothing else
+        visibility.add("OV")
+    return visibility
+
+
+def build_file_def(
+    classes: List[DistributedClass],
+    structs: List[DistributedStruct],
+    exclusions: Collection[str],
+) -> DistributedFileDef:
+    """Applies the exclusions and propagates the visibility to the superclasses.
+
+    The classes must be in declaration order, which is topologically sorted
+    since a dclass can only inherit from classes declared before it.
+    """
+    classes_dict = {x.name: x for x in classes}
+    for exclusion in exclusions:
+        if (suffix := exclusion[-2:]) in ("OV", "AI", "UD"):
+            e = exclusion[:-2]
+        else:
+            e, suffix = exclusion, "CL"
+        if e not in classes_dict:
+            raise ValueError(f"Unable to exclude {exclusion}: there is no dclass {e}")
+        classes_dict[e].visibility.discard(suffix)
+
+    # Make sure that superclasses are in the OV file, mainly.
+    # Walking the classes children-first propagates visibility through the whole
+    # hierarchy in a single pass, since every subclass is visited before its parents
+    for f in reversed(classes):
+        for g in f.superclasses:
+            g.visibility.update(f.visibility)
+
+    return DistributedFileDef(tuple(classes_dict.values()), tuple(structs))
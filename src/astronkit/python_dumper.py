@@ -1,14 +1,173 @@
-from textwrap import indent
-from typing import List, Literal, Optional, Tuple
+import dataclasses
+import re
+import shutil
+import struct
+import tempfile
+import time
+from typing import (
+    IO,
+    Callable,
+    ContextManager,
+    Dict,
+    FrozenSet,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
 
+from astronkit.analyzer import length_prefixed
+from astronkit.codec_dumper import FORMATS, CodecDumper, make_tuple
+from astronkit.counters import COUNTERS_MODULE
+from astronkit.stats import ClassStats, GenerationStats
 from astronkit.types import (
     DCKeyword,
     DCParameter,
+    DistributedArray,
     DistributedClass,
     DistributedFileDef,
     DistributedMethod,
+    DistributedScaled,
     DistributedStruct,
+    DistributedType,
+    DistributedTypeVanilla,
 )
+from astronkit.validator_dumper import VALIDATORS_MODULE
+
+Category = Literal["CL", "OV", "AI", "UD"]
+# What a stub file contains: the classic typed module, or its split into a .pyi with the
+# typing only and a lean runtime module with the class hierarchy and the method bodies
+Variant = Literal["module", "stub", "runtime"]
+T = TypeVar("T")
+# Keyed by object identity. The object itself is kept in the value,
+# so that its id can't be reused while the cache is alive.
+RenderCache = Dict[Tuple[int, ...], Tuple[object, T, FrozenSet[str]]]
+# Modules of the struct and tuple aliases, in every package of the split layout
+STRUCTS_MODULE = "_structs"
+ALIASES_MODULE = "_aliases"
+# Module of the helpers called by the generated methods, in the split layout
+RUNTIME_MODULE = "_runtime"
+# array.array typecodes of the numeric types, which are the same as the struct formats.
+# Bools are a typedef of uint8 but received as bool, so their arrays stay lists
+ARRAY_TYPECODES: Dict[DistributedTypeVanilla, str] = {
+    k: v for k, v in FORMATS.items() if k != DistributedTypeVanilla.bool_
+}
+# DatagramIterator reads of the types, giving the same values as Panda3D's unpacking.
+# Bools are unpacked as integers, and a char as a string of one character
+DECODE_VANILLA: Dict[DistributedTypeVanilla, str] = {
+    DistributedTypeVanilla.uint8: "di.getUint8()",
+    DistributedTypeVanilla.uint16: "di.getUint16()",
+    DistributedTypeVanilla.uint32: "di.getUint32()",
+    DistributedTypeVanilla.uint64: "di.getUint64()",
+    DistributedTypeVanilla.int8: "di.getInt8()",
+    DistributedTypeVanilla.int16: "di.getInt16()",
+    DistributedTypeVanilla.int32: "di.getInt32()",
+    DistributedTypeVanilla.int64: "di.getInt64()",
+    DistributedTypeVanilla.double: "di.getFloat64()",
+    DistributedTypeVanilla.string: "di.getString()",
+    DistributedTypeVanilla.blob: "di.getBlob()",
+    DistributedTypeVanilla.largeblob: "di.getBlob32()",
+    DistributedTypeVanilla.bool_: "di.getUint8()",
+    DistributedTypeVanilla.char: "di.getFixedString(1)",
+}
+# Bytes before the arguments in the datagram of a field update, by category
+UPDATE_HEADER_SIZES: Dict[Category, int] = {
+    # Message type, doId and field number
+    "CL": 8,
+    "OV": 8,
+    # Server header, doId and field number
+    "AI": 25,
+    "UD": 25,
+}
+# Tuple aliases by name, with their definition and the symbols it needs
+AliasDefinitions = Dict[str, Tuple[str, FrozenSet[str]]]
+
+
+class TupleAliases:
+    """The names of the parameter tuples of a file, shared by the dumpers of its categories.
+
+    A tuple is named after the first field using it in file order, with a counter if that
+    name is already taken by another tuple, so every dumper agrees on the names even when
+    the classes are dumped in chunks by other processes.
+    """
+
+    def __init__(self) -> None:
+        self.definitions: AliasDefinitions = {}
+        # Names by definition, None for the tuples that are too short to be worth an alias
+        self.names: Dict[str, Optional[str]] = {}
+        # The file the names were given for, and a number that changes with them
+        self.source: Optional[DistributedFileDef] = None
+        self.version = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class DumperOptions:
+    """Switches for the generated output, the defaults give the classic layout."""
+
+    # Classes that add no sendable fields inherit sendUpdate from their stub parent,
+    # and fields with the same parameters share one overload
+    compact_overloads: bool = False
+    # Every category is a package with one module per class, loaded lazily by the package
+    split_modules: bool = False
+    # Parameter tuples are defined once as module level aliases, named after their content
+    alias_tuples: bool = False
+    # Classes get a table of their field numbers, and sendUpdate formats the datagram
+    # of the field found by number instead of going through the repository by name
+    field_numbers: bool = False
+    # AI and UD classes get sendUpdates, which sends several updates as a single datagram
+    batch_updates: bool = False
+    # Classes get a table of the methods they receive by field number, for dispatch_update
+    dispatch_tables: bool = False
+    # Sent and received updates are counted in the AstronCounters module
+    field_counters: bool = False
+    # Classes that send updates are decorated to check them with the AstronValidators module
+    validators: bool = False
+    # Numeric arrays are received as array.array, decoded from the datagram by dispatch_update
+    array_buffers: bool = False
+    # AI classes get getRequiredFields, which returns the values of every required field at once
+    required_fields: bool = False
+
+
+def make_names_tuple(names: Sequence[str]) -> str:
+    quoted = [f'"{name}"' for name in names]
+    return "(" + ", ".join(quoted) + ("," if len(quoted) == 1 else "") + ")"
+
+
+def indent(text: str, prefix: str) -> str:
+    # Generated blocks never contain blank lines, so this is equivalent
+    # to textwrap.indent but a lot cheaper
+    return prefix + text.replace("\n", "\n" + prefix)
+
+
+class StubBody:
+    """The part of a stub file that follows the imports, spooled to a temporary file.
+
+    The imports are only known once every class has been dumped, so the classes are
+    streamed here one by one and copied after the imports at the end.
+    """
+
+    def __init__(self, structs: List[str]) -> None:
+        self.file: IO[str] = tempfile.TemporaryFile("w+")
+        if structs:
+            _ = self.file.write("\n".join(structs) + "\n\n")
+        self.empty = True
+
+    def add_class(self, text: str) -> None:
+        if not self.empty:
+            _ = self.file.write("\n\n")
+        _ = self.file.write(text)
+        self.empty = False
+
+    def write_to(self, imports: str, fp: TextIO) -> None:
+        _ = fp.write(imports + "\n\n")
+        _ = self.file.seek(0)
+        shutil.copyfileobj(self.file, fp)
+        self.file.close()
 
 
 class PythonDumper:
@@ -17,6 +176,10 @@ class PythonDumper:
         target_version: Tuple[int, int],
         category: Literal["CL", "OV", "AI", "UD"],
         distributed_package: str,
+        options: Optional[DumperOptions] = None,
+        type_cache: Optional[RenderCache[str]] = None,
+        aliases: Optional[TupleAliases] = None,
+        variant: Variant = "module",
     ) -> None:
         self.category: Literal["CL", "OV", "AI", "UD"] = category
         self.appendix = {"CL": "", "OV": "OV", "AI": "AI", "UD": "UD"}[category]
@@ -27,10 +190,50 @@ class PythonDumper:
         self.target_version = target_version
         self.symbols: set[str] = set()
         self.distributed_package = distributed_package
+        self.options = options or DumperOptions()
+        self.variant: Variant = variant
+        # Rendered types don't depend on the category, so this can be shared between dumpers
+        self.type_cache: RenderCache[str] = {} if type_cache is None else type_cache
+        self.overload_cache: RenderCache[List[Tuple[str, str]]] = {}
+        # Like the rendered types, tuple aliases can be shared between dumpers
+        self.aliases = TupleAliases() if aliases is None else aliases
+        # Version of the alias names that the cached renderings use
+        self.alias_version = 0
+        # Set to collect statistics about every dumped class
+        self.class_stats: Optional[List[ClassStats]] = None
+        # Set to reuse the renderings of classes between generations, see watch.reuse_unchanged
+        self.class_cache: Optional[RenderCache[str]] = None
 
     def add_symbol(self, sym: str):
         self.symbols.add(sym)
 
+    def use_struct(self, alias: str):
+        # In a single file the aliases are defined above the classes
+        if self.options.split_modules:
+            self.add_symbol(f".{STRUCTS_MODULE}.{alias}")
+
+    def memoize(
+        self, cache: RenderCache[T], key: Tuple[int, ...], obj: object, render: Callable[[], T]
+    ) -> T:
+        """Returns the cached rendering, and adds the symbols it needed to this dumper."""
+        if (cached := cache.get(key)) is None:
+            outer_symbols, self.symbols = self.symbols, set()
+            try:
+                value = render()
+            finally:
+                symbols, self.symbols = self.symbols, outer_symbols
+            cached = cache[key] = (obj, value, frozenset(symbols))
+        self.symbols |= cached[2]
+        return cached[1]
+
+    def dump_type(self, typ: DistributedType, is_input: bool) -> str:
+        return self.memoize(
+            self.type_cache,
+            (id(typ), is_input, *self.target_version),
+            typ,
+            lambda: typ.dump(self, is_input),
+        )
+
     def dump_methods(
         self,
         obj: DistributedClass,
@@ -40,27 +243,41 @@ class PythonDumper:
         if overloads is None:
             overloads = []
         rows: List[str] = []
-        for method in obj.fields:
-            if self.canSend(method):
-                self.dump_sendUpdate_overload(method, overloads)
-
-            if not only_sendUpdates:
-                if (
-                    DCKeyword.required in method.keywords
-                    and self.category == "AI"
-                    and any(not x.has_default for x in method.parameters)
-                ):
+        if not only_sendUpdates:
+            for method in obj.fields:
+                if self.category == "AI" and self.has_getter(method):
                     rows.append(indent(self.dump_getter(method), " " * 4))
 
                 if self.canReceive(obj, method):
                     rows.append(indent(self.dump_receiver(method), " " * 4))
 
-        for sc in obj.superclasses:
-            _ = self.dump_methods(sc, overloads, only_sendUpdates=True)
+        overloads.extend(self.dump_sendUpdate_overloads(obj))
         return rows, overloads
 
+    def dump_sendUpdate_overloads(self, obj: DistributedClass) -> List[Tuple[str, str]]:
+        """Overloads for the class and its superclasses, computed once per class since subclasses repeat them."""
+
+        def render() -> List[Tuple[str, str]]:
+            overloads: List[Tuple[str, str]] = []
+            for method in obj.fields:
+                if self.canSend(method):
+                    self.dump_sendUpdate_overload(method, overloads)
+            for sc in obj.superclasses:
+                overloads.extend(self.dump_sendUpdate_overloads(sc))
+            return overloads
+
+        if self.variant != "runtime":
+            return self.memoize(self.overload_cache, (id(obj),), obj, render)
+        # The runtime module has no annotations, the overloads are only compared
+        # to find the classes that send updates
+        outer_symbols, self.symbols = self.symbols, set()
+        try:
+            return self.memoize(self.overload_cache, (id(obj),), obj, render)
+        finally:
+            self.symbols = outer_symbols
+
     def make_method(
-        self, key: str, args: str, ellipsis: bool, no_overload: bool
+        self, keys: Sequence[str], args: str, ellipsis: bool, no_overload: bool
     ) -> List[str]:
         out: List[str] = []
 
@@ -80,14 +297,12 @@ class PythonDumper:
             argsOut = ", value"
         else:
             self.add_symbol("typing.Literal")
-            key = f'Literal["{key}"]'
+            key = "Literal[" + ", ".join(f'"{k}"' for k in keys) + "]"
         out.extend(
             [
                 "@overload",
                 f"def sendUpdate(self, field: {key}{argsIn}, /) -> None:",
-                "    ..."
-                if ellipsis
-                else " " * 4 + f"{self.superclass}.sendUpdate(self, field{argsOut})",
+                *(["    ..."] if ellipsis else self.make_send_body("sendUpdate", argsOut)),
             ]
         )
         if self.category in ("AI", "UD"):
@@ -95,43 +310,493 @@ class PythonDumper:
                 [
                     "@overload",
                     f"def sendUpdateToAvatarId(self, avId: int, field: {key}{argsIn}, /) -> None:",
-                    "    ..."
-                    if ellipsis
-                    else " " * 4
-                    + f"{self.superclass}.sendUpdateToAvatarId(self, avId, field{argsOut})",
+                    *(
+                        ["    ..."]
+                        if ellipsis
+                        else self.make_send_body("sendUpdateToAvatarId", argsOut)
+                    ),
                 ]
             )
             out.extend(
                 [
                     "@overload",
                     f"def sendUpdateToAccountId(self, avId: int, field: {key}{argsIn}, /) -> None:",
-                    "    ..."
-                    if ellipsis
-                    else " " * 4
-                    + f"{self.superclass}.sendUpdateToAccountId(self, avId, field{argsOut})",
+                    *(
+                        ["    ..."]
+                        if ellipsis
+                        else self.make_send_body("sendUpdateToAccountId", argsOut)
+                    ),
                 ]
             )
 
         return out
 
+    def make_send_body(self, method: str, argsOut: str) -> List[str]:
+        avId = "" if method == "sendUpdate" else ", avId"
+        if not self.options.field_numbers and not self.options.field_counters:
+            return [" " * 4 + f"{self.superclass}.{method}(self{avId}, field{argsOut})"]
+
+        # Same datagrams as the Astron classes, formatted here to resolve the field
+        # by number or to count the size of the update
+        value = "value" if argsOut else "()"
+        if self.options.field_numbers:
+            # The fields are only resolved on the first send of every class
+            self.add_symbol(f".{RUNTIME_MODULE}.dc_fields")
+            self.add_symbol(f".{RUNTIME_MODULE}.resolve_fields")
+            self.add_symbol(f".{RUNTIME_MODULE}.lookup_field")
+        field = "(dc_fields.get(self.__class__) or resolve_fields(self)).get(field) or lookup_field(self, field)"
+        if self.category in ("CL", "OV"):
+            rows = ["    if self.cr:"]
+            if self.options.field_numbers:
+                rows.append(f"        dcfield = {field}")
+                datagram = f"dcfield.clientFormatUpdate(self.doId, {value})"
+            else:
+                datagram = f"self.dclass.clientFormatUpdate(field, self.doId, {value})"
+            if not self.options.field_counters:
+                return rows + [f"        self.cr.send({datagram})"]
+            return rows + [
+                f"        dg = {datagram}",
+                f"        {self.make_count_sent('dg')}",
+                "        self.cr.send(dg)",
+            ]
+        channel = {
+            "sendUpdate": "self.doId",
+            "sendUpdateToAvatarId": "self.GetPuppetConnectionChannel(avId)",
+            "sendUpdateToAccountId": "self.GetAccountConnectionChannel(avId)",
+        }[method]
+        rows = ["    if self.air:"]
+        if self.options.field_numbers:
+            rows.append(f"        dcfield = {field}")
+            datagram = f"dcfield.aiFormatUpdate(self.doId, {channel}, self.air.ourChannel, {value})"
+        else:
+            datagram = f"self.dclass.aiFormatUpdate(field, self.doId, {channel}, self.air.ourChannel, {value})"
+        if not self.options.field_counters:
+            return rows + [f"        self.air.send({datagram})"]
+        return rows + [
+            f"        dg = {datagram}",
+            f"        {self.make_count_sent('dg')}",
+            "        self.air.send(dg)",
+        ]
+
+    def sibling_symbol(self, module: str, name: str) -> str:
+        # Modules shared by every category, next to the stub files or packages
+        parent = ".." if self.options.split_modules else "."
+        self.add_symbol(f"{parent}{module}.{name}")
+        return name
+
+    def make_count_sent(self, datagram: str) -> str:
+        size = f"{datagram}.getLength() - {UPDATE_HEADER_SIZES[self.category]}"
+        return f'{self.sibling_symbol(COUNTERS_MODULE, "count_sent")}("{self.category}", self, field, {size})'
+
+    def dump_count_receivers(self, names: List[str]) -> str:
+        """Counts the calls of the receivers implemented by the subclasses of the stub."""
+        self.add_symbol("typing.Any")
+        count_receivers = self.sibling_symbol(COUNTERS_MODULE, "count_receivers")
+        return "\n".join(
+            [
+                "def __init_subclass__(cls, **kwargs: Any) -> None:",
+                "    # Before the stub parents, which skip the receivers wrapped here",
+                f'    {count_receivers}(cls, "{self.category}", {make_names_tuple(names)})',
+                "    super().__init_subclass__(**kwargs)",
+            ]
+        )
+
+    def make_batch_method(self, overloads: List[Tuple[str, str]]) -> str:
+        """sendUpdates, which takes (field, value) pairs typed like the sendUpdate overloads."""
+        self.add_symbol("typing.Literal")
+        options: List[str] = []
+        # Fields without parameters are given an empty tuple, like sendUpdate(field, ())
+        for keys, args in self.group_overloads([o for o in overloads if o[1]]):
+            literal = "Literal[" + ", ".join(f'"{k}"' for k in keys) + "]"
+            options.append(f"{self.get_tuple_id()}[{literal}, {args}]")
+        self.add_symbol(f".{RUNTIME_MODULE}.send_updates")
+        return "\n".join(
+            [
+                f"def sendUpdates(self, updates: {self.iterable_id()}[{self.make_union(options)}], /) -> None:",
+                "    ..." if self.variant == "stub" else "    send_updates(self, updates)",
+            ]
+        )
+
+    def make_runtime_methods(self) -> str:
+        """The send methods of the runtime module, without the overloads and annotations."""
+        rows = ["def sendUpdate(self, field, value=(), /):", *self.make_send_body("sendUpdate", ", value")]
+        if self.category in ("AI", "UD"):
+            for method in ("sendUpdateToAvatarId", "sendUpdateToAccountId"):
+                rows += [f"def {method}(self, avId, field, value=(), /):", *self.make_send_body(method, ", value")]
+        if self.options.batch_updates and self.category in ("AI", "UD"):
+            self.add_symbol(f".{RUNTIME_MODULE}.send_updates")
+            rows += ["def sendUpdates(self, updates, /):", "    send_updates(self, updates)"]
+        return "\n".join(rows)
+
+    def iterable_id(self) -> str:
+        if self.target_version >= (3, 9):
+            self.add_symbol("collections.abc.Iterable")
+        else:
+            self.add_symbol("typing.Iterable")
+        return "Iterable"
+
+    def runtime_names(self) -> List[str]:
+        """The helpers needed by the dumped classes, defined once per file or package."""
+        prefix = f".{RUNTIME_MODULE}."
+        names = {s[len(prefix) :] for s in self.symbols if s.startswith(prefix)}
+        if self.options.dispatch_tables:
+            # Called by the repository rather than by the stubs
+            names.add("dispatch_update")
+        if self.options.field_numbers and "send_updates" in names:
+            names.add("resolve_fields")
+        # Defined with resolve_fields
+        names.discard("dc_fields")
+        names.discard("lookup_field")
+        return sorted(names)
+
+    def dump_runtime(self, names: List[str]) -> str:
+        helpers = {
+            "abstract": self.dump_abstract,
+            "dispatch_update": self.dump_dispatch_update,
+            "read_array": self.dump_read_array,
+            "read_buffer": self.dump_read_buffer,
+            "resolve_fields": self.dump_resolve_fields,
+            "send_updates": self.dump_send_updates,
+        }
+        if self.variant != "stub":
+            return "\n\n\n".join(helpers[name]() for name in names)
+
+        # A .pyi only declares the helpers, and imports the names of their signatures
+        outer_symbols, self.symbols = self.symbols, set()
+        try:
+            text = "\n\n\n".join(helpers[name]() for name in names)
+        finally:
+            symbols, self.symbols = self.symbols, outer_symbols
+        signatures = "\n".join(f"{row} ..." for row in text.split("\n") if row.startswith("def "))
+        self.symbols |= {
+            s for s in symbols if re.search(rf"\b{s.rsplit('.', 1)[-1]}\b", signatures)
+        }
+        return signatures
+
+    def dump_abstract(self) -> str:
+        self.add_symbol("abc")
+        self.add_symbol("typing.Any")
+        return "\n".join(
+            [
+                "@abc.abstractmethod",
+                "def abstract(self: Any, *args: Any) -> Any: ...",
+            ]
+        )
+
+    def dump_resolve_fields(self) -> str:
+        self.add_symbol("typing.Any")
+        if self.target_version >= (3, 9):
+            self.add_symbol("collections.abc.Mapping")
+            table = "dict[Any, Mapping[str, Any]]"
+        else:
+            self.add_symbol("typing.Dict")
+            self.add_symbol("typing.Mapping")
+            table = "Dict[Any, Mapping[str, Any]]"
+        return "\n".join(
+            [
+                "# The DCField of every name of FIELD_NUMBERS, by class of the distributed objects",
+                f"dc_fields: {table} = {{}}",
+                "",
+                "",
+                "def resolve_fields(obj: Any) -> Mapping[str, Any]:",
+                "    # The objects of a class share their dclass, so its fields are only looked up once",
+                "    fields = {name: obj.dclass.getFieldByIndex(n) for name, n in obj.FIELD_NUMBERS.items()}",
+                "    dc_fields[obj.__class__] = fields",
+                "    return fields",
+                "",
+                "",
+                "def lookup_field(obj: Any, name: str) -> Any:",
+                "    # The fields the stubs can't send are not in FIELD_NUMBERS, and are looked up like Panda3D does",
+                "    dcfield = obj.dclass.getFieldByName(name)",
+                "    if dcfield is None:",
+                '        raise ValueError(f"{obj.dclass.getName()} has no field {name}")',
+                "    return dcfield",
+            ]
+        )
+
+    def dump_send_updates(self) -> str:
+        self.add_symbol("typing.Any")
+        self.add_symbol("panda3d.direct.DCPacker")
+        self.add_symbol("direct.distributed.PyDatagram.PyDatagram")
+        if self.target_version >= (3, 9):
+            self.add_symbol("collections.abc.Collection")
+        else:
+            self.add_symbol("typing.Collection")
+        if self.options.field_numbers:
+            field = "fields.get(field) or lookup_field(obj, field)"
+        else:
+            field = "obj.dclass.getFieldByName(field)"
+        updates = f"{self.iterable_id()}[{self.get_tuple_id()}[str, Collection[object]]]"
+        return "\n".join(
+            [
+                f"def send_updates(obj: Any, updates: {updates}) -> None:",
+                "    # One STATESERVER_OBJECT_SET_FIELDS message, Astron applies the fields in order",
+                "    if not obj.air:",
+                "        return",
+                *(
+                    ["    fields = dc_fields.get(obj.__class__) or resolve_fields(obj)"]
+                    if self.options.field_numbers
+                    else []
+                ),
+                "    packer = DCPacker()",
+                "    count = 0",
+                "    for field, value in updates:",
+                f"        dcfield = {field}",
+                "        packer.rawPackUint16(dcfield.getNumber())",
+                *(["        start = packer.getLength()"] if self.options.field_counters else []),
+                "        packer.beginPack(dcfield)",
+                "        dcfield.packArgs(packer, value)",
+                "        if not packer.endPack():",
+                '            raise ValueError(f"Unable to pack {field}: {value!r}")',
+                *(
+                    [
+                        f'        {self.sibling_symbol(COUNTERS_MODULE, "count_sent")}("{self.category}", obj, field,'
+                        " packer.getLength() - start)"
+                    ]
+                    if self.options.field_counters
+                    else []
+                ),
+                "        count += 1",
+                "    if count:",
+                "        dg = PyDatagram()",
+                "        dg.addServerHeader(obj.doId, obj.air.ourChannel, 2021)",
+                "        dg.addUint32(obj.doId)",
+                "        dg.addUint16(count)",
+                "        dg.appendData(packer.getBytes())",
+                "        obj.air.send(dg)",
+            ]
+        )
+
+    def dump_dispatch_update(self) -> str:
+        self.add_symbol("typing.Any")
+        self.add_symbol("panda3d.core.DatagramIterator")
+        if self.target_version >= (3, 9):
+            self.add_symbol("collections.abc.Mapping")
+            table = "dict[int, Any]"
+        else:
+            self.add_symbol("typing.Dict")
+            self.add_symbol("typing.Mapping")
+            table = "Dict[int, Any]"
+        count_received = (
+            self.sibling_symbol(COUNTERS_MODULE, "count_received") if self.options.field_counters else ""
+        )
+        return "\n".join(
+            [
+                "def get_receivers(cls: Any) -> Mapping[int, Any]:",
+                "    # Resolved once per class from its RECEIVERS and the DECODERS of its stubs,",
+                "    # so that overridden methods are used",
+                '    receivers = cls.__dict__.get("_receivers")',
+                "    if receivers is None:",
+                f"        decoders: {table} = {{}}",
+                "        for klass in reversed(cls.__mro__):",
+                '            decoders.update(klass.__dict__.get("DECODERS", {}))',
+                "        receivers = {",
+                "            n: (name, decoders[n], getattr(cls, name))",
+                "            for n, name in cls.RECEIVERS.items()",
+                "            if n in decoders",
+                "        }",
+                "        cls._receivers = receivers",
+                "    return receivers",
+                "",
+                "",
+                "def dispatch_update(obj: Any, di: Any) -> None:",
+                "    # Same as obj.dclass.receiveUpdate(obj, di), with the arguments read straight from the datagram",
+                '    receivers = obj.__class__.__dict__.get("_receivers")',
+                "    if receivers is None:",
+                "        receivers = get_receivers(obj.__class__)",
+                *(["    start = di.getCurrentIndex()"] if count_received else []),
+                "    number = di.getUint16()",
+                "    receiver = receivers.get(number)",
+                "    if receiver is None:",
+                "        # Not received by the stubs, or not decoded by them: Panda3D reads the whole update",
+                "        it = DatagramIterator(di.getDatagram(), di.getCurrentIndex() - 2)",
+                "        obj.dclass.receiveUpdate(obj, it)",
+                "        di.skipBytes(it.getCurrentIndex() - di.getCurrentIndex())",
+                *(
+                    [
+                        f'        {count_received}("{self.category}", obj,'
+                        " obj.dclass.getFieldByIndex(number).getName(), it.getCurrentIndex() - start - 2)",
+                    ]
+                    if count_received
+                    else []
+                ),
+                "        return",
+                "    name, decode, method = receiver",
+                *(
+                    [
+                        "    args = decode(di)",
+                        f'    {count_received}("{self.category}", obj, name, di.getCurrentIndex() - start - 2)',
+                        "    method(obj, *args)",
+                    ]
+                    if count_received
+                    else ["    method(obj, *decode(di))"]
+                ),
+            ]
+        )
+
+    def dump_read_array(self) -> str:
+        self.add_symbol("typing.Any")
+        self.add_symbol("typing.Callable")
+        list_id = "list" if self.target_version >= (3, 9) else "List"
+        if list_id == "List":
+            self.add_symbol("typing.List")
+        return "\n".join(
+            [
+                f"def read_array(di: Any, read: Callable[[Any], Any]) -> {list_id}[Any]:",
+                "    # Variable-size arrays start with their size in bytes",
+                "    end = di.getUint16()",
+                "    end += di.getCurrentIndex()",
+                "    values = []",
+                "    while di.getCurrentIndex() < end:",
+                "        values.append(read(di))",
+                "    return values",
+            ]
+        )
+
+    def dump_read_buffer(self) -> str:
+        self.add_symbol("sys")
+        self.add_symbol("typing.Any")
+        self.add_symbol("array.array")
+        return "\n".join(
+            [
+                "def read_buffer(di: Any, code: str, size: int = -1) -> Any:",
+                "    # Copied as is from the datagram, variable-size arrays start with their size in bytes",
+                "    values = array(code)",
+                "    values.frombytes(di.extractBytes(di.getUint16() if size < 0 else size * values.itemsize))",
+                '    if sys.byteorder == "big":',
+                "        values.byteswap()",
+                "    return values",
+            ]
+        )
+
+    def array_code(self, typ: DistributedType) -> str:
+        """The array.array typecode of a numeric array, or ""."""
+        if (
+            not isinstance(typ, DistributedArray)
+            or not isinstance(typ.type, DistributedTypeVanilla)
+            or typ.type not in ARRAY_TYPECODES
+        ):
+            return ""
+        return ARRAY_TYPECODES[typ.type]
+
+    def decode_value(self, typ: DistributedType) -> Optional[str]:
+        """The expression reading a value of the type from di like Panda3D unpacks it, None if unsupported."""
+        if isinstance(typ, DistributedTypeVanilla):
+            return DECODE_VANILLA.get(typ)
+        elif isinstance(typ, DistributedScaled):
+            if (read := DECODE_VANILLA.get(typ.type)) is None:
+                return None
+            return f"{read} / {typ.divisor}" if typ.divisor > 1 else read
+        elif isinstance(typ, DistributedArray):
+            if typ.type == DistributedTypeVanilla.char:
+                # Sent like a string, or without the length if fixed
+                return "di.getString()" if typ.size < 0 else f"di.getFixedString({typ.size})"
+            if (read := self.decode_value(typ.type)) is None:
+                return None
+            if not length_prefixed(typ):
+                return f"[{read} for _ in range({typ.size})]"
+            if (fmt := CodecDumper().get_format(typ.type)) is None:
+                self.add_symbol(f".{RUNTIME_MODULE}.read_array")
+                return f"read_array(di, lambda di: {read})"
+            size = struct.calcsize("<" + fmt)
+            count = "di.getUint16()" if size == 1 else f"di.getUint16() // {size}"
+            return f"[{read} for _ in range({count})]"
+        return self.decode_params(typ.fields)
+
+    def decode_params(self, params: Sequence[DCParameter]) -> Optional[str]:
+        values: List[str] = []
+        for p in params:
+            if self.options.array_buffers and (code := self.array_code(p.type)):
+                assert isinstance(p.type, DistributedArray)
+                self.add_symbol(f".{RUNTIME_MODULE}.read_buffer")
+                size = "" if p.type.size < 0 else f", {p.type.size}"
+                values.append(f'read_buffer(di, "{code}"{size})')
+            elif (read := self.decode_value(p.type)) is not None:
+                values.append(read)
+            else:
+                return None
+        return make_tuple(values)
+
+    def dump_decoders(self, obj: DistributedClass) -> str:
+        """The decoders of the methods the class receives, merged with the inherited ones by get_receivers."""
+        rows: List[str] = []
+        for method in obj.fields:
+            if self.canReceive(obj, method) and (read := self.decode_params(method.parameters)):
+                rows.append(f"    {method.number}: lambda di: {read},")
+        if not rows:
+            return ""
+        return "\n".join(["DECODERS = {", *rows, "}"])
+
+    def receiver_numbers(self, obj: DistributedClass) -> Dict[int, str]:
+        """Names of the methods the class receives by field number, including the inherited ones."""
+        numbers: Dict[int, str] = {}
+        for method in obj.fields:
+            if self.canReceive(obj, method):
+                numbers[method.number] = method.name
+        for sc in obj.superclasses:
+            for number, name in self.receiver_numbers(sc).items():
+                _ = numbers.setdefault(number, name)
+        return numbers
+
+    def dump_receivers(self, numbers: Dict[int, str]) -> str:
+        rows = ["RECEIVERS = {"]
+        rows += [f'    {number}: "{name}",' for number, name in sorted(numbers.items())]
+        rows.append("}")
+        return "\n".join(rows)
+
+    def field_numbers(self, obj: DistributedClass) -> Dict[str, int]:
+        """Numbers of the fields the class can send, which are looked up by name like Panda3D does."""
+        numbers: Dict[str, int] = {}
+        for method in obj.fields:
+            if self.canSend(method):
+                _ = numbers.setdefault(method.name, method.number)
+        for sc in obj.superclasses:
+            for name, number in self.field_numbers(sc).items():
+                _ = numbers.setdefault(name, number)
+        return numbers
+
+    def dump_field_numbers(self, obj: DistributedClass) -> str:
+        rows = ["FIELD_NUMBERS = {"]
+        rows += [f'    "{name}": {number},' for name, number in self.field_numbers(obj).items()]
+        rows.append("}")
+        return "\n".join(rows)
+
+    def group_overloads(
+        self, overloads: List[Tuple[str, str]]
+    ) -> List[Tuple[List[str], str]]:
+        if not self.options.compact_overloads:
+            return [([key], args) for key, args in overloads]
+        # Fields with the same parameters only differ by their name, so they can share one
+        # overload, i.e. `field: Literal["setX", "setY"], value: tuple[float]`
+        groups: Dict[str, List[str]] = {}
+        for key, args in overloads:
+            keys = groups.setdefault(args, [])
+            if key not in keys:
+                keys.append(key)
+        return [(keys, args) for args, keys in groups.items()]
+
     def make_methods(self, overloads: List[Tuple[str, str]]) -> str:
         lines: List[str] = []
-        if len(overloads) == 1:
+        grouped = self.group_overloads(overloads)
+        if len(grouped) == 1:
             methods = self.make_method(
-                overloads[0][0], overloads[0][1], ellipsis=False, no_overload=False
+                grouped[0][0], grouped[0][1], ellipsis=self.variant == "stub", no_overload=False
             )
             methods = [m for m in methods if "@overload" not in m]
             lines = methods
         else:
             self.add_symbol("typing.overload")
-            for key, args in overloads:
+            for keys, args in grouped:
                 lines.extend(
-                    self.make_method(key, args, ellipsis=True, no_overload=False)
+                    self.make_method(keys, args, ellipsis=True, no_overload=False)
                 )
+            if self.variant == "stub":
+                # Overloads can't have an implementation in a .pyi
+                return "\n".join(lines)
             lines.extend(
                 [
                     m
-                    for m in self.make_method("", "", ellipsis=False, no_overload=True)
+                    for m in self.make_method([], "", ellipsis=False, no_overload=True)
                     if "@overload" not in m
                 ]
             )
@@ -139,30 +804,116 @@ class PythonDumper:
         return "\n".join(lines)
 
     def dump_class(self, obj: DistributedClass) -> str:
+        if self.class_cache is not None:
+            return self.memoize(
+                self.class_cache, (id(obj),), obj, lambda: self.render_class(obj)
+            )
+        return self.render_class(obj)
+
+    def prune(self, classes: Sequence[DistributedClass]) -> None:
+        """Forgets the renderings of classes that are not in this list anymore."""
+        keep = {(id(c),) for c in classes}
+        for key in self.overload_cache.keys() - keep:
+            del self.overload_cache[key]
+        if self.class_cache is not None:
+            for key in self.class_cache.keys() - keep:
+                del self.class_cache[key]
+
+    def render_class(self, obj: DistributedClass) -> str:
+        start = time.perf_counter()
         self.add_symbol("abc")
         self.add_symbol(
             f"{self.distributed_package}." + self.superclass + "." + self.superclass
         )
         ovSuperclass: List[str] = []
         if self.category == "OV":
-            self.add_symbol(f".AstronStubsCL.Stub{obj.name}")
+            if self.options.split_modules:
+                self.add_symbol(f"..AstronStubsCL.{obj.name}.Stub{obj.name}")
+            else:
+                self.add_symbol(f".AstronStubsCL.Stub{obj.name}")
             ovSuperclass.append(f"Stub{obj.name}")
+        if self.options.split_modules:
+            for x in obj.superclasses:
+                self.add_symbol(f".{x.name + self.appendix}.Stub{x.name + self.appendix}")
         superclasses = (
             ["Stub" + x.name + self.appendix for x in obj.superclasses]
             + ovSuperclass
-            + [self.superclass, "abc.ABC"]
+            + [self.superclass]
         )
+        if self.variant == "stub":
+            # In a .pyi, mypy wants an explicit metaclass for the classes that
+            # inherit abstract methods without declaring any
+            superclasses.append("metaclass=abc.ABCMeta")
+        else:
+            superclasses.append("abc.ABC")
         rows = [f"class Stub{obj.name + self.appendix}({', '.join(superclasses)}):"]
 
         methods, sendUpdate_overloads = self.dump_methods(obj)
+        num_fields = len(methods)
+        if (
+            self.options.dispatch_tables or self.options.field_counters
+        ) and (receivers := self.receiver_numbers(obj)):
+            # Like sendUpdate, an unchanged table is inherited from the first stub parent
+            if not obj.superclasses or receivers != self.receiver_numbers(obj.superclasses[0]):
+                if self.options.dispatch_tables:
+                    methods.append(indent(self.dump_receivers(receivers), " " * 4))
+                elif self.variant != "stub":
+                    # dispatch_update counts the received updates itself, with their size
+                    names = [receivers[n] for n in sorted(receivers)]
+                    methods.append(indent(self.dump_count_receivers(names), " " * 4))
+        if self.options.dispatch_tables and self.variant != "stub":
+            if decoders := self.dump_decoders(obj):
+                methods.append(indent(decoders, " " * 4))
+        if self.options.required_fields and self.category == "AI":
+            # A class with the same required fields as its first stub parent inherits the method
+            if required := self.required_getters(obj):
+                defaults = self.required_defaults(obj)
+                if (
+                    not obj.superclasses
+                    or required != self.required_getters(obj.superclasses[0])
+                    or defaults != self.required_defaults(obj.superclasses[0])
+                ):
+                    override = any(self.required_getters(sc) for sc in obj.superclasses)
+                    methods.append(
+                        indent(self.dump_required_fields(required, defaults, override), " " * 4)
+                    )
+        if (
+            self.options.compact_overloads
+            and obj.superclasses
+            and sendUpdate_overloads
+            == self.dump_sendUpdate_overloads(obj.superclasses[0])
+        ):
+            # Nothing new to send, the first stub parent already has the same sendUpdate
+            sendUpdate_overloads = []
         if sendUpdate_overloads:
-            methods.append(indent(self.make_methods(sendUpdate_overloads), " " * 4))
+            if self.options.field_numbers:
+                methods.append(indent(self.dump_field_numbers(obj), " " * 4))
+            if self.variant == "runtime":
+                methods.append(indent(self.make_runtime_methods(), " " * 4))
+            else:
+                methods.append(indent(self.make_methods(sendUpdate_overloads), " " * 4))
+                if self.options.batch_updates and self.category in ("AI", "UD"):
+                    methods.append(indent(self.make_batch_method(sendUpdate_overloads), " " * 4))
+        if sendUpdate_overloads and self.options.validators:
+            rows.insert(0, f"@{self.sibling_symbol(VALIDATORS_MODULE, 'validated')}")
         if not methods:
             rows.append("    pass")
         else:
             rows += methods
 
-        return "\n".join(rows)
+        text = "\n".join(rows)
+        if self.class_stats is not None:
+            self.class_stats.append(
+                ClassStats(
+                    self.category,
+                    obj.name + self.appendix,
+                    time.perf_counter() - start,
+                    text.count("\n") + 1,
+                    num_fields,
+                    len(self.group_overloads(sendUpdate_overloads)),
+                )
+            )
+        return text
 
     def canSend(self, method: DistributedMethod):
         if self.category == "OV":
@@ -228,22 +979,94 @@ class PythonDumper:
     def make_supercall(self, method: str, arg_names: List[str]):
         return f"return {self.superclass}.{method}({', '.join(['self'] + arg_names)})"
 
+    def tuple_definition(self, parameters: Sequence[DCParameter]) -> Tuple[str, FrozenSet[str]]:
+        """The tuple of the parameters' output types, and the symbols it needs."""
+        outer_symbols, self.symbols = self.symbols, set()
+        try:
+            args = ", ".join(self.dump_type(x.type, False) for x in parameters)
+            definition = f"{self.get_tuple_id()}[{args}]"
+        finally:
+            symbols, self.symbols = self.symbols, outer_symbols
+        return definition, frozenset(symbols)
+
+    def name_aliases(self, obj: DistributedFileDef) -> None:
+        """Names the tuple aliases of the file, before any of its classes is dumped."""
+        if not self.options.alias_tuples:
+            return
+        aliases = self.aliases
+        if aliases.source is not obj:
+            definitions: AliasDefinitions = {}
+            names: Dict[str, Optional[str]] = {}
+            for cls in obj.all_classes():
+                for method in cls.fields:
+                    if not method.parameters:
+                        continue
+                    definition, symbols = self.tuple_definition(method.parameters)
+                    if definition in names:
+                        continue
+                    base = method.name[:1].upper() + method.name[1:] + "Args"
+                    name, count = base, 2
+                    while name in definitions:
+                        name, count = f"{base}{count}", count + 1
+                    if len(definition) <= len(name) + 2:
+                        # Not worth it for short tuples such as tuple[int]
+                        names[definition] = None
+                    else:
+                        names[definition] = name
+                        definitions[name] = (definition, symbols)
+            if names != aliases.names:
+                aliases.version += 1
+            aliases.definitions, aliases.names, aliases.source = definitions, names, obj
+        if self.alias_version != aliases.version:
+            # The cached renderings refer to the previous names
+            self.overload_cache.clear()
+            if self.class_cache is not None:
+                self.class_cache.clear()
+            self.alias_version = aliases.version
+
+    def dump_tuple(self, parameters: Sequence[DCParameter]) -> str:
+        """The tuple of the parameters' output types, or the alias for it."""
+        definition, symbols = self.tuple_definition(parameters)
+        name = self.aliases.names.get(definition) if self.options.alias_tuples else None
+        if name is None:
+            self.symbols |= symbols
+            return definition
+
+        self.add_symbol(f".{ALIASES_MODULE}.{name}")
+        if self.options.split_modules:
+            # Imported for type checkers only
+            return f'"{name}"'
+        return name
+
+    def alias_names(self) -> List[str]:
+        prefix = f".{ALIASES_MODULE}."
+        return sorted(s[len(prefix) :] for s in self.symbols if s.startswith(prefix))
+
+    def dump_aliases(self, names: List[str]) -> str:
+        return "\n".join(f"{name} = {self.aliases.definitions[name][0]}" for name in names)
+
     def dump_sendUpdate_overload(
         self, method: DistributedMethod, overloads: List[Tuple[str, str]]
     ):
-        args = ", ".join(x.type.dump(self, False) for x in method.parameters)
-        if not args:
+        if not method.parameters:
             overloads.append((method.name, ""))
             overloads.append((method.name, f"{self.get_tuple_id()}[()]"))
         else:
-            overloads.append((method.name, f"{self.get_tuple_id()}[{args}]"))
+            overloads.append((method.name, self.dump_tuple(method.parameters)))
+
+    def make_abstract(self, name: str) -> str:
+        # abc only looks at the names of the abstract methods, so they share one function
+        self.add_symbol(f".{RUNTIME_MODULE}.abstract")
+        return f"{name} = abstract"
 
     def dump_receiver(self, method: DistributedMethod):
+        if self.variant == "runtime":
+            return self.make_abstract(method.name)
         self.add_symbol("abc")
         args = ", ".join(
             ["self"]
             + [
-                (x.name or f"arg{i}") + ": " + x.type.dump(self, True)
+                (x.name or f"arg{i}") + ": " + self.dump_param_type(x.type)
                 for i, x in enumerate(method.parameters)
             ]
         )
@@ -255,29 +1078,104 @@ class PythonDumper:
             ]
         )
 
-    def dump_getter(self, method: DistributedMethod):
-        self.add_symbol("abc")
-        args = ", ".join(x.type.dump(self, False) for x in method.parameters)
+    def dump_param_type(self, typ: DistributedType) -> str:
+        if self.options.array_buffers and self.array_code(typ):
+            assert isinstance(typ, DistributedArray)
+            self.add_symbol("array.array")
+            # array is only subscriptable at runtime from Python 3.12 on
+            return f'"array[{self.dump_type(typ.type, True)}]"'
+        return self.dump_type(typ, True)
+
+    def has_getter(self, method: DistributedMethod) -> bool:
+        # Required fields whose parameters all have defaults are generated with them
+        return DCKeyword.required in method.keywords and any(
+            not x.has_default for x in method.parameters
+        )
+
+    def getter_name(self, method: DistributedMethod) -> str:
         if method.name.startswith("set"):
-            correct_name = "get" + method.name[3:]
-        else:
-            correct_name = "get" + method.name
+            return "get" + method.name[3:]
+        return "get" + method.name
 
-        options = [f"{self.get_tuple_id()}[{args}]"]
+    def getter_type(self, method: DistributedMethod) -> str:
+        options = [self.dump_tuple(method.parameters)]
         if len(method.parameters) == 1:
-            options.append(method.parameters[0].type.dump(self, False))
+            options.append(self.dump_type(method.parameters[0].type, False))
+        return self.make_union(options)
+
+    def dump_getter(self, method: DistributedMethod):
+        correct_name = self.getter_name(method)
+        if self.variant == "runtime":
+            return self.make_abstract(correct_name)
+
+        self.add_symbol("abc")
         return "\n".join(
             [
                 "@abc.abstractmethod",
-                f"def {correct_name}(self) -> {self.make_union(options)}: ...",
+                f"def {correct_name}(self) -> {self.getter_type(method)}: ...",
             ]
         )
 
-    def make_option(self, fields: List[DCParameter], is_input: bool) -> str:
+    def inherited_fields(self, obj: DistributedClass) -> Dict[str, DistributedMethod]:
+        """Fields of the class by name, like Panda3D's inherited fields: a field shadows the
+        ones of the same name in the superclasses, and the first superclass shadows the next ones."""
+        fields: Dict[str, DistributedMethod] = {}
+        for sc in obj.superclasses:
+            for name, method in self.inherited_fields(sc).items():
+                _ = fields.setdefault(name, method)
+        for method in obj.fields:
+            fields[method.name] = method
+        return fields
+
+    def required_getters(self, obj: DistributedClass) -> List[DistributedMethod]:
+        """The required fields of the class that have a getter, in the order of its generate."""
+        fields = self.inherited_fields(obj).values()
+        return sorted((m for m in fields if self.has_getter(m)), key=lambda m: m.number)
+
+    def required_defaults(self, obj: DistributedClass) -> List[DistributedMethod]:
+        """The required fields of the class without a getter, whose parameters all have defaults."""
+        fields = self.inherited_fields(obj).values()
+        return sorted(
+            (m for m in fields if DCKeyword.required in m.keywords and not self.has_getter(m)),
+            key=lambda m: m.number,
+        )
+
+    def dump_required_fields(
+        self, methods: List[DistributedMethod], defaults: List[DistributedMethod], override: bool
+    ) -> str:
+        """getRequiredFields, which calls every getter of a generate, and the names of their fields."""
+        names = make_names_tuple([m.name for m in methods])
+        calls = [f"self.{self.getter_name(m)}()" for m in methods]
+        body = "return (" + ", ".join(calls) + ("," if len(calls) == 1 else "") + ")"
+        if self.variant == "runtime":
+            rows = [f"REQUIRED_FIELDS = {names}", "def getRequiredFields(self):", f"    {body}"]
+            return "\n".join(rows)
+        types = ", ".join(self.getter_type(m) for m in methods)
+        # Subclasses return more values, which is not a compatible override of a tuple
+        ignore = "  # type: ignore[override]" if override else ""
+        rows = [
+            f"REQUIRED_FIELDS: {self.get_tuple_id()}[str, ...] = {names}",
+            f"def getRequiredFields(self) -> {self.get_tuple_id()}[{types}]:{ignore}",
+        ]
+        # Generated blocks have no blank lines, so the docstring is a single paragraph
+        summary = "The values of the REQUIRED_FIELDS, in the order of the generate."
+        if defaults:
+            left_out = ", ".join(m.name for m in defaults)
+            rows += [
+                f'    """{summary} Left out: {left_out}.',
+                "    None of their parameters lacks a default, so they have no getter and Panda3D packs the defaults.",
+                '    """',
+            ]
+        else:
+            rows.append(f'    """{summary}"""')
+        rows.append("    ..." if self.variant == "stub" else f"    {body}")
+        return "\n".join(rows)
+
+    def make_option(self, fields: Sequence[DCParameter], is_input: bool) -> str:
         return (
             f"{self.get_tuple_id()}["
             + ", ".join(
-                [f.type.dump(self, is_input) for f in fields] if fields else ["()"]
+                [self.dump_type(f.type, is_input) for f in fields] if fields else ["()"]
             )
             + "]"
         )
@@ -302,19 +1200,245 @@ class PythonDumper:
     def visible(self, cls: DistributedClass):
         return self.category in cls.visibility
 
-    def dump_file(self, obj: DistributedFileDef) -> str:
-        result = (
-            "\n".join([self.dump_struct(s) for s in obj.structs])
-            + "\n\n"
-            + "\n\n".join([self.dump_class(c) for c in obj.classes if self.visible(c)])
-        )
-
+    def dump_imports(self) -> str:
         symbol_dumps: list[str] = []
-        for s in self.symbols:
+        for s in sorted(self.symbols):
+            if s.startswith(f".{ALIASES_MODULE}.") or (
+                s.startswith(f".{RUNTIME_MODULE}.") and not self.options.split_modules
+            ):
+                # Defined in the file itself, see dump_header
+                continue
             if "." in s:
                 start, end = s.rsplit(".", 1)
                 symbol_dumps.append(f"from {start} import {end}")
             else:
                 symbol_dumps.append(f"import {s}")
+        return "\n".join(symbol_dumps)
+
+    def dump_header(self) -> str:
+        """The imports of a single file, followed by the tuple aliases and the helpers it uses."""
+        names = self.alias_names()
+        for name in names:
+            self.symbols |= self.aliases.definitions[name][1]
+        helpers = self.runtime_names()
+        runtime = self.dump_runtime(helpers)
+        header = self.dump_imports()
+        if names:
+            header += "\n\n" + self.dump_aliases(names)
+        if helpers:
+            header += "\n\n\n" + runtime + "\n"
+        return header
+
+    def join_file(self, structs: List[str], classes: List[str]) -> str:
+        # The imports are rendered last, since the symbols are collected while dumping
+        body = "\n".join(structs) + "\n\n" if structs else ""
+        return self.dump_header() + "\n\n" + body + "\n\n".join(classes)
+
+    def dump_file(self, obj: DistributedFileDef) -> str:
+        self.name_aliases(obj)
+        return self.join_file(
+            [self.dump_struct(s) for s in obj.structs],
+            [self.dump_class(c) for c in obj.classes if self.visible(c)],
+        )
+
+    def dump_module(self, text: str, module: Optional[str] = None) -> str:
+        """Adds the imports to a module of the split layout."""
+        # Struct and tuple aliases only appear in quoted annotations,
+        # they don't need to be loaded at runtime
+        deferred: List[str] = []
+        for alias_module in (STRUCTS_MODULE, ALIASES_MODULE):
+            prefix = f".{alias_module}."
+            names = sorted(s[len(prefix) :] for s in self.symbols if s.startswith(prefix))
+            self.symbols = {s for s in self.symbols if not s.startswith(prefix)}
+            # Aliases refer to each other within their module
+            if alias_module != module:
+                deferred += [f"    from .{alias_module} import {n}" for n in names]
+        if deferred:
+            self.add_symbol("typing.TYPE_CHECKING")
+        imports = self.dump_imports()
+        if deferred:
+            imports += "\n\nif TYPE_CHECKING:\n" + "\n".join(deferred)
+        return imports + "\n\n" + text
+
+    def dump_class_module(self, obj: DistributedClass) -> Tuple[str, List[str]]:
+        """The module of a class, and the tuple aliases it uses."""
+        self.symbols = set()
+        text = self.dump_class(obj)
+        names = self.alias_names()
+        return self.dump_module(text), names
+
+    def dump_structs_module(self, structs: Sequence[DistributedStruct]) -> str:
+        self.symbols = set()
+        text = "\n".join(self.dump_struct(s) for s in structs)
+        return self.dump_module(text, STRUCTS_MODULE)
+
+    def dump_runtime_module(self, names: List[str]) -> str:
+        self.symbols = set()
+        text = self.dump_runtime(names)
+        return self.dump_imports() + "\n\n\n" + text + "\n"
+
+    def dump_aliases_module(self, names: List[str]) -> str:
+        self.symbols = set()
+        for name in names:
+            self.symbols |= self.aliases.definitions[name][1]
+        return self.dump_module(self.dump_aliases(names), ALIASES_MODULE)
+
+    def dump_package_init(self, exports: Mapping[str, str]) -> str:
+        """The __init__ of a split package, exports maps every public name to its module.
+
+        Type checkers see plain re-exports, while at runtime the modules are only
+        imported once one of their names is accessed.
+        """
+        rows = ["from typing import TYPE_CHECKING", "", "if TYPE_CHECKING:"]
+        rows += [
+            f"    from .{module} import {name} as {name}"
+            for name, module in exports.items()
+        ] or ["    pass"]
+        rows += ["else:", "    import importlib", "", "    _modules = {"]
+        rows += [f'        "{name}": "{module}",' for name, module in exports.items()]
+        rows += [
+            "    }",
+            "",
+            "    def __getattr__(name):",
+            "        try:",
+            "            module = _modules[name]",
+            "        except KeyError:",
+            '            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None',
+            '        value = getattr(importlib.import_module("." + module, __name__), name)',
+            "        globals()[name] = value",
+            "        return value",
+            "",
+            "    def __dir__():",
+            "        return sorted(set(globals()) | set(_modules))",
+        ]
+        return "\n".join(rows) + "\n"
+
+    def write_package(
+        self,
+        obj: DistributedFileDef,
+        open_output: Callable[[str], ContextManager[TextIO]],
+    ) -> None:
+        """Writes the split layout of this category, open_output opens a path relative to the output."""
+        package = "AstronStubs" + self.category
+        exports: Dict[str, str] = {}
+        self.name_aliases(obj)
+        if obj.structs:
+            with open_output(f"{package}/{STRUCTS_MODULE}.py") as f:
+                _ = f.write(self.dump_structs_module(obj.structs))
+            for s in obj.structs:
+                exports[s.name + "T"] = exports[s.name + "TIn"] = STRUCTS_MODULE
+        aliases: Set[str] = set()
+        runtime: Set[str] = set()
+        for c in obj.classes:
+            if self.visible(c):
+                # Modules are named after the dclass, so that importing one doesn't
+                # shadow the lazily loaded class of the same name in the package
+                module = c.name + self.appendix
+                text, names = self.dump_class_module(c)
+                with open_output(f"{package}/{module}.py") as f:
+                    _ = f.write(text)
+                aliases.update(names)
+                runtime.update(self.runtime_names())
+                exports["Stub" + module] = module
+        if aliases:
+            with open_output(f"{package}/{ALIASES_MODULE}.py") as f:
+                _ = f.write(self.dump_aliases_module(sorted(aliases)))
+            for name in sorted(aliases):
+                exports[name] = ALIASES_MODULE
+        if runtime:
+            with open_output(f"{package}/{RUNTIME_MODULE}.py") as f:
+                _ = f.write(self.dump_runtime_module(sorted(runtime)))
+            for name in sorted(runtime):
+                exports[name] = RUNTIME_MODULE
+            if "dispatch_update" in runtime:
+                exports["get_receivers"] = RUNTIME_MODULE
+        with open_output(f"{package}/__init__.py") as f:
+            _ = f.write(self.dump_package_init(exports))
+
+    def write_file(self, obj: DistributedFileDef, fp: TextIO) -> None:
+        """Same as dump_file, but only keeps one class in memory at a time."""
+        self.name_aliases(obj)
+        body = StubBody([self.dump_struct(s) for s in obj.structs])
+        for c in obj.classes:
+            if self.visible(c):
+                body.add_class(self.dump_class(c))
+        body.write_to(self.dump_header(), fp)
+
+
+class MultiDumper:
+    """Dumps several categories in a single traversal of the file.
+
+    Rendered types are shared between the categories, so they are only computed once.
+    """
+
+    def __init__(
+        self,
+        target_version: Tuple[int, int],
+        categories: List[Category],
+        distributed_package: str,
+        options: Optional[DumperOptions] = None,
+        stats: Optional[GenerationStats] = None,
+        variant: Variant = "module",
+    ) -> None:
+        type_cache: RenderCache[str] = {}
+        aliases = TupleAliases()
+        self.dumpers = {
+            k: PythonDumper(
+                target_version, k, distributed_package, options, type_cache, aliases, variant
+            )
+            for k in categories
+        }
+        if stats is not None:
+            for d in self.dumpers.values():
+                d.class_stats = stats.classes
+
+    def name_aliases(self, obj: DistributedFileDef) -> None:
+        for d in self.dumpers.values():
+            d.name_aliases(obj)
+
+    def dump_files(self, obj: DistributedFileDef) -> Dict[Category, str]:
+        self.name_aliases(obj)
+        structs = {k: [d.dump_struct(s) for s in obj.structs] for k, d in self.dumpers.items()}
+        classes: Dict[Category, List[str]] = {k: [] for k in self.dumpers}
+        for c in obj.classes:
+            for k, d in self.dumpers.items():
+                if d.visible(c):
+                    classes[k].append(d.dump_class(c))
+        return {k: d.join_file(structs[k], classes[k]) for k, d in self.dumpers.items()}
+
+    def dump_bodies(self, obj: DistributedFileDef) -> Dict[Category, Tuple[str, StubBody]]:
+        """The header and the spooled body of every file, ready to be written."""
+        self.name_aliases(obj)
+        for d in self.dumpers.values():
+            d.symbols = set()
+        bodies = {
+            k: StubBody([d.dump_struct(s) for s in obj.structs])
+            for k, d in self.dumpers.items()
+        }
+        for c in obj.classes:
+            for k, d in self.dumpers.items():
+                if d.visible(c):
+                    bodies[k].add_class(d.dump_class(c))
+        return {k: (d.dump_header(), bodies[k]) for k, d in self.dumpers.items()}
+
+    def write_files(self, obj: DistributedFileDef, fps: Mapping[Category, TextIO]) -> None:
+        """Same as dump_files, but only keeps one class in memory at a time."""
+        for k, (header, body) in self.dump_bodies(obj).items():
+            body.write_to(header, fps[k])
+
+    def write_packages(
+        self,
+        obj: DistributedFileDef,
+        open_output: Callable[[str], ContextManager[TextIO]],
+    ) -> None:
+        for d in self.dumpers.values():
+            d.write_package(obj, open_output)
+
+    def keep_renderings(self) -> None:
+        """Reuses the renderings of the classes that are dumped again, by identity."""
+        for d in self.dumpers.values():
+            d.class_cache = {}
 
-        return "\n".join(symbol_dumps) + "\n\n" + result
+    def prune(self, classes: Sequence[DistributedClass]) -> None:
+        for d in self.dumpers.values():
+            d.prune(classes)
@@ -0,0 +1,516 @@
+import dataclasses
+import pathlib
+import re
+from typing import Collection, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from astronkit.parser_common import (
+    basic_types,
+    build_file_def,
+    class_visibility,
+    expand_import_symbol,
+)
+from astronkit.types import (
+    DCKeyword,
+    DCParameter,
+    DistributedArray,
+    DistributedClass,
+    DistributedFileDef,
+    DistributedMethod,
+    DistributedStruct,
+    DistributedType,
+    DistributedTypeVanilla,
+    TypeTable,
+)
+
+# A pure-Python reader for dc files, which builds the same DistributedFileDef as
+# dclass_parser does through Panda3D's DCFile, without importing panda3d.
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?:\s+|//[^\n]*|/\*.*?\*/)*
+    (?:
+      (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    | (?P<hex><[0-9a-fA-F\s]*>)
+    | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+    | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<op>[{}()\[\];:,=/%*.+-])
+    | (?P<error>\S)
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Keywords that Panda3D declares on every DCFile, other ones need a `keyword` statement
+_DEFAULT_KEYWORDS = {
+    "required",
+    "broadcast",
+    "ownrecv",
+    "ram",
+    "db",
+    "clsend",
+    "clrecv",
+    "ownsend",
+    "airecv",
+}
+
+
+class _Token(NamedTuple):
+    kind: str
+    value: str
+    offset: int
+
+
+def tokenize(text: str) -> Iterator[_Token]:
+    # Whitespace and comments are consumed as a prefix of the following token
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup or "error"
+        yield _Token(kind, match.group(kind), match.start(kind))
+    yield _Token("eof", "", len(text))
+
+
+@dataclasses.dataclass(frozen=True)
+class _SimpleType:
+    # Simple parameters are resolved late, since the typedef name used for them matters
+    base: str
+    divisor: int = 1
+    modulus: float = 0.0
+    typedef: Optional[str] = None
+
+    def resolve(self, table: TypeTable) -> DistributedType:
+        if self.typedef is not None and "bool" in self.typedef:
+            # Corner case: bools are commonly typedef'd and it's nicer to allow bool inputs,
+            # even though it's slightly less typesafe but it makes APIs better
+            return DistributedTypeVanilla.bool_
+        base = basic_types[self.base]
+        if isinstance(base, DistributedTypeVanilla) and (self.divisor > 1 or self.modulus):
+            return table.scale(base, self.divisor, self.modulus)
+        if self.divisor > 1:
+            return DistributedTypeVanilla.double
+        return base
+
+
+_TypeSpec = Union[_SimpleType, DistributedType]
+
+
+@dataclasses.dataclass
+class _DCField:
+    name: str
+    parameters: List[DCParameter]
+    keywords: List[str]
+    is_atomic: bool
+    number: int = -1
+
+
+@dataclasses.dataclass
+class _DCClass:
+    name: str
+    is_struct: bool
+    parents: List["_DCClass"]
+    fields: List[_DCField] = dataclasses.field(default_factory=list)
+
+    def find_field(self, name: str) -> Optional[_DCField]:
+        for f in self.fields:
+            if f.name == name:
+                return f
+        for p in self.parents:
+            if (found := p.find_field(name)) is not None:
+                return found
+        return None
+
+
+def _parse_int(value: str) -> int:
+    if value.lower().startswith("0x"):
+        return int(value, 16)
+    return int(value)
+
+
+def _parse_number(value: str) -> float:
+    if value.lower().startswith("0x"):
+        return float(int(value, 16))
+    return float(value)
+
+
+def _implicit_default(typ: DistributedType) -> bool:
+    # Panda3D considers structs with a defaulted field, and arrays of them, to have a default
+    if isinstance(typ, DistributedStruct):
+        return any(f.has_default for f in typ.fields)
+    elif isinstance(typ, DistributedArray):
+        return _implicit_default(typ.type)
+    return False
+
+
+class DCFileParser:
+    def __init__(self) -> None:
+        self.classes: List[_DCClass] = []
+        self.classes_by_name: Dict[str, _DCClass] = {}
+        self.typedefs: Dict[str, _TypeSpec] = {}
+        self.keywords: Set[str] = set(_DEFAULT_KEYWORDS)
+        self.classnames: Set[str] = set()
+        self.table = TypeTable()
+        self.num_fields = 0
+
+        self.filename = ""
+        self.text = ""
+        self.tokens: Iterator[_Token] = iter(())
+        self.token = _Token("eof", "", 0)
+        self.lookahead: List[_Token] = []
+
+    def copy(self) -> "DCFileParser":
+        """A parser that continues from the files read so far, without changing this one.
+
+        The classes read so far are shared, since reading more files never changes them.
+        """
+        parser = DCFileParser()
+        parser.classes = list(self.classes)
+        parser.classes_by_name = dict(self.classes_by_name)
+        parser.typedefs = dict(self.typedefs)
+        parser.keywords = set(self.keywords)
+        parser.classnames = set(self.classnames)
+        parser.table = self.table.copy()
+        parser.num_fields = self.num_fields
+        return parser
+
+    # Token stream
+
+    def advance(self) -> _Token:
+        token = self.token
+        self.token = self.lookahead.pop() if self.lookahead else next(self.tokens)
+        return token
+
+    def peek_next(self) -> _Token:
+        """Returns the token after the current one."""
+        if not self.lookahead:
+            self.lookahead.append(next(self.tokens))
+        return self.lookahead[0]
+
+    def error(self, token: _Token, message: str) -> ValueError:
+        # Positions are only resolved to lines here, to keep the tokenizer lean
+        line = self.text.count("\n", 0, token.offset) + 1
+        column = token.offset - self.text.rfind("\n", 0, token.offset)
+        return ValueError(
+            f"{self.filename}:{line}:{column}: {message} (at {token.value!r})"
+        )
+
+    def check(self, value: str) -> bool:
+        # Literal tokens keep their quotes or brackets, so they can't be mistaken for these
+        return self.token.value == value
+
+    def accept(self, value: str) -> bool:
+        if self.check(value):
+            _ = self.advance()
+            return True
+        return False
+
+    def expect(self, value: str) -> _Token:
+        if not self.check(value):
+            raise self.error(self.token, f"Expected {value!r}")
+        return self.advance()
+
+    def expect_kind(self, kind: str) -> _Token:
+        if self.token.kind != kind:
+            raise self.error(self.token, f"Expected {kind}")
+        return self.advance()
+
+    def skip_balanced(self) -> None:
+        closing = {"(": ")", "[": "]", "{": "}"}
+        stack = [closing[self.advance().value]]
+        while stack:
+            token = self.advance()
+            if token.kind == "eof":
+                raise self.error(token, f"Expected {stack[-1]!r}")
+            if token.kind == "op" and token.value in closing:
+                stack.append(closing[token.value])
+            elif token.kind == "op" and token.value == stack[-1]:
+                _ = stack.pop()
+
+    # Statements
+
+    def read_file(self, path: Union[str, pathlib.Path]) -> None:
+        try:
+            text = pathlib.Path(path).read_text()
+        except OSError as e:
+            raise ValueError(f"Unable to read dcfile: {path}") from e
+        self.read(text, str(path))
+
+    def read(self, text: str, filename: str = "<string>") -> None:
+        self.filename = filename
+        self.text = text
+        self.tokens = tokenize(text)
+        self.token = next(self.tokens)
+        self.lookahead = []
+        while self.token.kind != "eof":
+            self.parse_statement()
+
+    def parse_statement(self) -> None:
+        token = self.token
+        if token.kind == "error":
+            raise self.error(token, "Unexpected character")
+        if self.accept(";"):
+            return
+        elif self.accept("from"):
+            self.parse_module_name()
+            _ = self.expect("import")
+            self.parse_import_symbols()
+        elif self.accept("import"):
+            self.parse_module_name()
+        elif self.accept("typedef"):
+            self.parse_typedef()
+        elif self.accept("keyword"):
+            self.keywords.add(self.expect_kind("ident").value)
+            _ = self.accept(";")
+        elif self.accept("dclass"):
+            self.parse_class(is_struct=False)
+        elif self.accept("struct"):
+            self.parse_class(is_struct=True)
+        else:
+            raise self.error(token, "Unexpected token")
+
+    def parse_module_name(self) -> None:
+        _ = self.expect_kind("ident")
+        while self.accept(".") or self.accept("/"):
+            _ = self.expect_kind("ident")
+
+    def parse_import_symbols(self) -> None:
+        if self.accept("*"):
+            self.classnames.add("*")
+            return
+        while True:
+            parts = [self.expect_kind("ident").value]
+            while self.accept("/"):
+                parts.append(self.expect_kind("ident").value)
+            self.classnames |= set(expand_import_symbol("/".join(parts)))
+            if not self.accept(","):
+                return
+
+    def parse_typedef(self) -> None:
+        token = self.token
+        spec, sizes, name, _ = self.parse_parameter_parts()
+        if not name:
+            raise self.error(token, "Typedef needs a name")
+        if sizes:
+            spec = self.wrap_arrays(spec, sizes)
+        self.typedefs[name] = spec
+        _ = self.accept(";")
+
+    def parse_class(self, is_struct: bool) -> None:
+        name_token = self.expect_kind("ident")
+        parents: List[_DCClass] = []
+        if self.accept(":"):
+            while True:
+                parent_token = self.expect_kind("ident")
+                parent = self.classes_by_name.get(parent_token.value)
+                if parent is None or parent.is_struct:
+                    raise self.error(parent_token, "Unknown dclass")
+                parents.append(parent)
+                if not self.accept(","):
+                    break
+
+        cls = _DCClass(name_token.value, is_struct, parents)
+        _ = self.expect("{")
+        while not self.accept("}"):
+            field = self.parse_field(cls)
+            # Like Panda3D, fields are numbered in declaration order across all the files,
+            # and struct fields take a number too
+            field.number = self.num_fields
+            self.num_fields += 1
+            cls.fields.append(field)
+        _ = self.accept(";")
+
+        if cls.name in self.classes_by_name:
+            raise self.error(name_token, "Duplicate class name")
+        self.classes.append(cls)
+        self.classes_by_name[cls.name] = cls
+
+    # Fields
+
+    def parse_field(self, cls: _DCClass) -> _DCField:
+        first, second = self.token, self.peek_next()
+        if first.kind == "ident" and first.value not in basic_types:
+            if second.value == "(" and second.kind == "op":
+                return self.parse_atomic_field()
+            if second.value == ":" and second.kind == "op":
+                return self.parse_molecular_field(cls)
+
+        spec, sizes, name, has_default = self.parse_parameter_parts()
+        param = self.make_parameter(spec, sizes, name, has_default)
+        return _DCField(name, [param], self.parse_keywords(), is_atomic=False)
+
+    def parse_atomic_field(self) -> _DCField:
+        name = self.advance().value
+        _ = self.expect("(")
+        parameters: List[DCParameter] = []
+        if not self.accept(")"):
+            while True:
+                parameters.append(self.make_parameter(*self.parse_parameter_parts()))
+                if self.accept(")"):
+                    break
+                _ = self.expect(",")
+        return _DCField(name, parameters, self.parse_keywords(), is_atomic=True)
+
+    def parse_molecular_field(self, cls: _DCClass) -> _DCField:
+        name = self.advance().value
+        _ = self.expect(":")
+        parameters: List[DCParameter] = []
+        keywords: Optional[List[str]] = None
+        while True:
+            token = self.expect_kind("ident")
+            atomic = cls.find_field(token.value)
+            if atomic is None or not atomic.is_atomic:
+                raise self.error(token, "Unknown atomic field")
+            if keywords is None:
+                keywords = atomic.keywords
+            elif set(keywords) != set(atomic.keywords):
+                raise self.error(token, "Mismatched keywords in molecule")
+            parameters.extend(atomic.parameters)
+            if not self.accept(","):
+                break
+        _ = self.expect(";")
+        return _DCField(name, parameters, list(keywords or []), is_atomic=False)
+
+    def parse_keywords(self) -> List[str]:
+        keywords: List[str] = []
+        while not self.accept(";"):
+            token = self.expect_kind("ident")
+            if token.value not in self.keywords:
+                raise self.error(token, "Unknown keyword")
+            keywords.append(token.value)
+        return keywords
+
+    # Parameters
+
+    def parse_parameter_parts(self) -> Tuple[_TypeSpec, List[int], str, bool]:
+        token = self.expect_kind("ident")
+        spec: _TypeSpec
+        if token.value in basic_types:
+            divisor = 1
+            modulus = 0.0
+            if self.check("("):
+                # Value ranges don't change the type
+                self.skip_balanced()
+            while self.check("/") or self.check("%"):
+                is_divisor = self.advance().value == "/"
+                number = self.expect_kind("number")
+                if is_divisor:
+                    divisor = _parse_int(number.value)
+                else:
+                    modulus = _parse_number(number.value)
+            spec = _SimpleType(token.value, divisor, modulus)
+        elif token.value in self.typedefs:
+            spec = self.typedefs[token.value]
+            if isinstance(spec, _SimpleType):
+                spec = dataclasses.replace(spec, typedef=token.value)
+        elif token.value in self.classes_by_name:
+            spec = self.make_struct(self.classes_by_name[token.value])
+        else:
+            raise self.error(token, "Unknown type")
+
+        sizes: List[int] = []
+        while self.check("["):
+            sizes.append(self.parse_array_size())
+        name = ""
+        if self.token.kind == "ident" and self.token.value not in self.keywords:
+            name = self.advance().value
+        while self.check("["):
+            sizes.append(self.parse_array_size())
+
+        has_default = self.accept("=")
+        if has_default:
+            self.skip_default_value()
+        return spec, sizes, name, has_default
+
+    def parse_array_size(self) -> int:
+        _ = self.expect("[")
+        values: List[str] = []
+        while not self.accept("]"):
+            token = self.advance()
+            if token.kind == "eof":
+                raise self.error(token, "Expected ']'")
+            values.append(token.value)
+        # Only [n] and [n-n] have a fixed size
+        if len(values) == 1 or (
+            len(values) == 3 and values[1] == "-" and values[0] == values[2]
+        ):
+            try:
+                return _parse_int(values[0])
+            except ValueError:
+                pass
+        return -1
+
+    def skip_default_value(self) -> None:
+        if self.check("(") or self.check("[") or self.check("{"):
+            self.skip_balanced()
+        else:
+            _ = self.accept("-") or self.accept("+")
+            token = self.advance()
+            if token.kind not in ("number", "string", "hex", "ident"):
+                raise self.error(token, "Invalid default value")
+        if self.accept("*"):
+            _ = self.expect_kind("number")
+
+    def wrap_arrays(self, spec: _TypeSpec, sizes: List[int]) -> DistributedType:
+        typ = spec.resolve(self.table) if isinstance(spec, _SimpleType) else spec
+        # The first brackets are the outermost array
+        for size in reversed(sizes):
+            typ = self.table.array(typ, size)
+        return typ
+
+    def make_parameter(
+        self, spec: _TypeSpec, sizes: List[int], name: str, has_default: bool
+    ) -> DCParameter:
+        typ = self.wrap_arrays(spec, sizes)
+        return self.table.parameter(name, typ, has_default or _implicit_default(typ))
+
+    def make_struct(self, cls: _DCClass) -> DistributedStruct:
+        # Every use of a struct refers to the same instance
+        if (struct := self.table.structs.get(cls.name)) is not None:
+            return struct
+        fields: List[DCParameter] = []
+        for f in cls.fields:
+            fields.extend(f.parameters)
+        struct = self.table.structs[cls.name] = DistributedStruct(cls.name, tuple(fields))
+        return struct
+
+    # Output
+
+    def build(self, exclusions: Collection[str]) -> DistributedFileDef:
+        classes: List[DistributedClass] = []
+        structs: List[DistributedStruct] = []
+        converted: Dict[str, DistributedClass] = {}
+
+        for cls in self.classes:
+            if cls.is_struct:
+                structs.append(self.make_struct(cls))
+                continue
+            fields = tuple(
+                DistributedMethod(
+                    f.name, tuple(f.parameters), DCKeyword.parse(f.keywords), f.number
+                )
+                for f in cls.fields
+            )
+            converted[cls.name] = DistributedClass(
+                cls.name,
+                tuple(converted[p.name] for p in cls.parents),
+                class_visibility(cls.name, self.classnames, fields),
+                fields,
+            )
+            classes.append(converted[cls.name])
+
+        return build_file_def(classes, structs, exclusions)
+
+
+def read_dcfiles(dcfiles: Collection[Union[str, pathlib.Path]]) -> DCFileParser:
+    parser = DCFileParser()
+    for f in dcfiles:
+        parser.read_file(f)
+    return parser
+
+
+def parse_dcfile(parser: DCFileParser, exclusions: Collection[str]) -> DistributedFileDef:
+    # Same interface as dclass_parser, for callers that time reading and building separately
+    return parser.build(exclusions)
+
+
+def parse_dcfiles(
+    dcfiles: Collection[Union[str, pathlib.Path]], exclusions: Collection[str]
+) -> DistributedFileDef:
+    return parse_dcfile(read_dcfiles(dcfiles), exclusions)
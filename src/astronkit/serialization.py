@@ -0,0 +1,150 @@
+import json
+import pathlib
+from typing import Any, Dict, Union
+
+from astronkit.types import (
+    DCKeyword,
+    DCParameter,
+    DistributedArray,
+    DistributedClass,
+    DistributedFileDef,
+    DistributedMethod,
+    DistributedScaled,
+    DistributedStruct,
+    DistributedType,
+    DistributedTypeVanilla,
+    TypeTable,
+)
+
+# Bump this whenever the layout below changes, old IR files will be rejected
+IR_FORMAT_VERSION = 3
+
+# The IR is stored as JSON. Classes and structs are written once and referenced by name,
+# so shared parents and structs used by many fields don't get duplicated on disk.
+# Fields are [name, parameters, keywords, number], parameters are [name, type, has_default],
+# types are either a DistributedTypeVanilla name, ["array", type, size],
+# ["scaled", type, divisor, modulus] or ["struct", name].
+
+
+class IREncoder:
+    def __init__(self) -> None:
+        self.structs: Dict[str, Any] = {}
+        self.classes: Dict[str, Any] = {}
+
+    def encode_type(self, typ: DistributedType) -> Any:
+        if isinstance(typ, DistributedTypeVanilla):
+            return typ.name
+        elif isinstance(typ, DistributedArray):
+            return ["array", self.encode_type(typ.type), typ.size]
+        elif isinstance(typ, DistributedScaled):
+            return ["scaled", typ.type.name, typ.divisor, typ.modulus]
+        else:
+            self.encode_struct(typ)
+            return ["struct", typ.name]
+
+    def encode_param(self, param: DCParameter) -> Any:
+        return [param.name, self.encode_type(param.type), param.has_default]
+
+    def encode_struct(self, struct: DistributedStruct) -> None:
+        if struct.name in self.structs:
+            return
+        self.structs[struct.name] = [self.encode_param(f) for f in struct.fields]
+
+    def encode_class(self, cls: DistributedClass) -> None:
+        if cls.name in self.classes:
+            return
+        for sc in cls.superclasses:
+            self.encode_class(sc)
+        self.classes[cls.name] = {
+            "superclasses": [sc.name for sc in cls.superclasses],
+            "visibility": sorted(cls.visibility),
+            "fields": [
+                [
+                    m.name,
+                    [self.encode_param(p) for p in m.parameters],
+                    m.keywords.names(),
+                    m.number,
+                ]
+                for m in cls.fields
+            ],
+        }
+
+    def encode_file(self, obj: DistributedFileDef) -> Dict[str, Any]:
+        for s in obj.structs:
+            self.encode_struct(s)
+        for c in obj.classes:
+            self.encode_class(c)
+        return {
+            "version": IR_FORMAT_VERSION,
+            "structs": self.structs,
+            "classes": self.classes,
+            "file_structs": [s.name for s in obj.structs],
+            "file_classes": [c.name for c in obj.classes],
+        }
+
+
+class IRDecoder:
+    def __init__(self, data: Dict[str, Any]) -> None:
+        if data.get("version") != IR_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported IR format version {data.get('version')}, expected {IR_FORMAT_VERSION}"
+            )
+        self.data = data
+        self.table = TypeTable()
+        self.structs: Dict[str, DistributedStruct] = {}
+        self.classes: Dict[str, DistributedClass] = {}
+
+    def decode_type(self, raw: Any) -> DistributedType:
+        if isinstance(raw, str):
+            return DistributedTypeVanilla[raw]
+        elif raw[0] == "array":
+            return self.table.array(self.decode_type(raw[1]), raw[2])
+        elif raw[0] == "scaled":
+            return self.table.scale(DistributedTypeVanilla[raw[1]], raw[2], raw[3])
+        elif raw[0] == "struct":
+            return self.decode_struct(raw[1])
+        raise ValueError(f"Unknown IR type: {raw}")
+
+    def decode_param(self, raw: Any) -> DCParameter:
+        return self.table.parameter(raw[0], self.decode_type(raw[1]), raw[2])
+
+    def decode_struct(self, name: str) -> DistributedStruct:
+        if name not in self.structs:
+            fields = tuple(self.decode_param(f) for f in self.data["structs"][name])
+            self.structs[name] = DistributedStruct(name, fields)
+        return self.structs[name]
+
+    def decode_class(self, name: str) -> DistributedClass:
+        if name not in self.classes:
+            raw = self.data["classes"][name]
+            self.classes[name] = DistributedClass(
+                name,
+                tuple(self.decode_class(sc) for sc in raw["superclasses"]),
+                set(raw["visibility"]),
+                tuple(
+                    DistributedMethod(
+                        m[0],
+                        tuple(self.decode_param(p) for p in m[1]),
+                        DCKeyword.parse(m[2]),
+                        m[3],
+                    )
+                    for m in raw["fields"]
+                ),
+            )
+        return self.classes[name]
+
+    def decode_file(self) -> DistributedFileDef:
+        return DistributedFileDef(
+            tuple(self.decode_class(c) for c in self.data["file_classes"]),
+            tuple(self.decode_struct(s) for s in self.data["file_structs"]),
+        )
+
+
+def dump_ir(obj: DistributedFileDef, path: Union[str, pathlib.Path]) -> None:
+    data = IREncoder().encode_file(obj)
+    _ = pathlib.Path(path).write_text(json.dumps(data, separators=(",", ":")))
+
+
+def load_ir(path: Union[str, pathlib.Path]) -> DistributedFileDef:
+    data: Dict[str, Any] = json.loads(pathlib.Path(path).read_text())
+    return IRDecoder(data).decode_file()
@@ -0,0 +1,197 @@
+import dataclasses
+import pathlib
+import py_compile
+import sys
+from typing import Collection, Dict, List, Optional, Sequence, Tuple, Union
+
+from astronkit.cache import GenerationCache, compute_key
+from astronkit.codec_dumper import CodecDumper
+from astronkit.counters import COUNTERS_MODULE, COUNTERS_SOURCE
+from astronkit.parallel_dumper import ParallelDumper
+from astronkit.python_dumper import Category, DumperOptions, MultiDumper, Variant
+from astronkit.python_parser import read_dcfiles
+from astronkit.stats import GenerationStats, phase
+from astronkit.types import DistributedClass, DistributedFileDef
+from astronkit.validator_dumper import VALIDATORS_MODULE, ValidatorDumper
+from astronkit.watch import reuse_unchanged
+
+CATEGORIES: List[Category] = ["AI", "CL", "UD", "OV"]
+
+
+class StubWriter:
+    """Writes the stub files of parsed dc files, and the modules that go with them.
+
+    The dumpers are kept between generations, so that keep_renderings can reuse the
+    renderings of the classes that are dumped again.
+    """
+
+    def __init__(
+        self,
+        options: Optional[DumperOptions] = None,
+        base_package: str = "direct.distributed",
+        target_version: Optional[Tuple[int, int]] = None,
+        typing_stubs: bool = False,
+        codecs: bool = False,
+        byte_compile: bool = False,
+        jobs: int = 1,
+        stats: Optional[GenerationStats] = None,
+    ) -> None:
+        self.options = options or DumperOptions()
+        if self.options.split_modules and (typing_stubs or jobs > 1):
+            raise ValueError("split_modules can't be used with typing_stubs or jobs yet")
+        self.base_package = base_package
+        # The stubs are generated for the running Python by default
+        self.target_version = target_version or (sys.version_info[0], sys.version_info[1])
+        self.typing_stubs = typing_stubs
+        self.codecs = codecs
+        self.byte_compile = byte_compile
+        self.jobs = jobs
+        self.stats = stats
+        # The stub files by suffix, the statistics are about the modules loaded at runtime
+        self.variants: Dict[str, Variant] = {".py": "module"}
+        if typing_stubs:
+            self.variants = {".py": "runtime", ".pyi": "stub"}
+        self.multi_dumpers = {
+            suffix: MultiDumper(
+                self.target_version,
+                CATEGORIES,
+                base_package,
+                self.options,
+                stats if suffix == ".py" else None,
+                variant,
+            )
+            for suffix, variant in self.variants.items()
+        }
+
+    def cache_options(self) -> Dict[str, object]:
+        """The options that change the outputs, for the key of the generation cache."""
+        return {
+            "base_package": self.base_package,
+            "dumper": dataclasses.asdict(self.options),
+            "codecs": self.codecs,
+            "typing_stubs": self.typing_stubs,
+            "byte_compile": self.byte_compile,
+        }
+
+    def write(self, parsed: DistributedFileDef, cache: GenerationCache) -> None:
+        """Writes every output through the cache, which only rewrites the ones that changed."""
+        stats = self.stats
+        if self.options.split_modules:
+            # Every module is written as soon as it is dumped
+            with phase(stats, "dump"):
+                self.multi_dumpers[".py"].write_packages(parsed, cache.open_output)
+        else:
+            for suffix, variant in self.variants.items():
+                dumper: Union[ParallelDumper, MultiDumper] = self.multi_dumpers[suffix]
+                if self.jobs > 1:
+                    dumper = ParallelDumper(
+                        self.target_version,
+                        CATEGORIES,
+                        self.base_package,
+                        self.jobs,
+                        self.options,
+                        stats if suffix == ".py" else None,
+                        variant,
+                    )
+                with phase(stats, f"dump{suffix}" if self.typing_stubs else "dump"):
+                    bodies = dumper.dump_bodies(parsed)
+                with phase(stats, f"write{suffix}" if self.typing_stubs else "write"):
+                    for k, (header, body) in bodies.items():
+                        with cache.open_output(f"AstronStubs{k}{suffix}") as fp:
+                            body.write_to(header, fp)
+        if self.options.field_counters:
+            cache.write_output(f"{COUNTERS_MODULE}.py", COUNTERS_SOURCE)
+        if self.options.validators:
+            cache.write_output(f"{VALIDATORS_MODULE}.py", ValidatorDumper().dump_file(parsed))
+        if self.codecs:
+            with phase(stats, "codecs"):
+                cache.write_output("AstronCodecs.py", CodecDumper().dump_file(parsed))
+        if self.byte_compile:
+            # With the running Python, which is the one the stubs are generated for
+            with phase(stats, "compile"):
+                for name in cache.produced:
+                    if name.endswith(".py"):
+                        _ = py_compile.compile(str(cache.directory / name), doraise=True)
+
+    def keep_renderings(self) -> None:
+        for multi_dumper in self.multi_dumpers.values():
+            multi_dumper.keep_renderings()
+
+    def prune(self, classes: Sequence[DistributedClass]) -> None:
+        for multi_dumper in self.multi_dumpers.values():
+            multi_dumper.prune(classes)
+
+
+class GenerationSession:
+    """Generates the stubs of several sets of dc files that share base dc files, in one process.
+
+    The base files are only read once. Panda3D's DCFile can't be copied, so they are read
+    with the built-in parser, which builds the same IR. Every set is read on top of a copy
+    of the base, and the classes it leaves unchanged keep their renderings from one set to
+    the next, so a set costs about as much as its own dc files.
+
+        session = GenerationSession(["base.dc"], DumperOptions(field_numbers=True))
+        session.generate(["toontown.dc"], "toontown/astronkit_data")
+        session.generate(["pirates.dc"], "pirates/astronkit_data")
+    """
+
+    def __init__(
+        self,
+        base_files: Sequence[Union[str, pathlib.Path]],
+        options: Optional[DumperOptions] = None,
+        base_package: str = "direct.distributed",
+        target_version: Optional[Tuple[int, int]] = None,
+        typing_stubs: bool = False,
+        codecs: bool = False,
+        byte_compile: bool = False,
+    ) -> None:
+        self.base_files = list(base_files)
+        self.parser = read_dcfiles(self.base_files)
+        # Exclusions may name classes of the sets, so the base is built without any
+        self.base = {c.name: c for c in self.parser.build(()).classes}
+        self.writer = StubWriter(
+            options, base_package, target_version, typing_stubs, codecs, byte_compile
+        )
+        self.writer.keep_renderings()
+
+    def parse(
+        self, files: Sequence[Union[str, pathlib.Path]], exclude: Collection[str] = ()
+    ) -> DistributedFileDef:
+        """The base dc files followed by these ones, the classes they don't change are the ones of the base."""
+        parser = self.parser.copy()
+        for f in files:
+            parser.read_file(f)
+        parsed, _ = reuse_unchanged(self.base, parser.build(exclude))
+        return parsed
+
+    def generate(
+        self,
+        files: Sequence[Union[str, pathlib.Path]],
+        out_dir: Union[str, pathlib.Path] = "astronkit_data",
+        exclude: Collection[str] = (),
+        cache: bool = True,
+    ) -> List[str]:
+        """Writes the stubs of the base and these dc files to out_dir, returns the rewritten outputs.
+
+        Like the command line, nothing is generated if the inputs didn't change since the
+        last generation in out_dir.
+        """
+        generation_cache = GenerationCache(pathlib.Path(out_dir))
+        key = compute_key(
+            [*self.base_files, *files],
+            {
+                **self.writer.cache_options(),
+                "exclude": sorted(exclude),
+                "parser": "python",
+                "dump_ir": None,
+                "from_ir": False,
+            },
+            self.writer.target_version,
+        )
+        if cache and generation_cache.is_fresh(key):
+            return []
+        self.writer.write(self.parse(files, exclude), generation_cache)
+        generation_cache.save(key)
+        # Renderings of the classes of this set won't be used by the other ones
+        self.writer.prune(list(self.base.values()))
+        return generation_cache.written
@@ -0,0 +1,117 @@
+import contextlib
+import dataclasses
+import json
+import pathlib
+import time
+import tracemalloc
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Union
+
+
+@dataclasses.dataclass
+class PhaseStats:
+    seconds: float
+    # Peak of the Python heap during the phase, allocations made by Panda3D are not included
+    peak_memory: int
+
+
+@dataclasses.dataclass(frozen=True)
+class ClassStats:
+    category: str
+    name: str
+    seconds: float
+    lines: int
+    # Receivers and getters
+    fields: int
+    # sendUpdate overloads, 0 if the class inherits sendUpdate
+    overloads: int
+
+
+@dataclasses.dataclass
+class FileStats:
+    classes: int = 0
+    fields: int = 0
+    overloads: int = 0
+    # Time spent dumping the classes of the file
+    seconds: float = 0.0
+    lines: int = 0
+    size: int = 0
+
+
+class GenerationStats:
+    """Collects the time and memory used by each phase of a generation, and what it emitted."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, PhaseStats] = {}
+        self.classes: List[ClassStats] = []
+        self.files: Dict[str, FileStats] = {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Before Python 3.9, the peak can't be reset and includes the earlier phases
+            self.phases[name] = PhaseStats(
+                time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+            )
+
+    def add_file(self, category: str, path: Union[str, pathlib.Path]) -> None:
+        """Adds a written file to the category, a category may have several files."""
+        file = self.files.setdefault(category, FileStats())
+        with open(path, "rb") as f:
+            for line in f:
+                file.lines += 1
+                file.size += len(line)
+
+    def finish(self) -> None:
+        # Per-file counts are sums over the classes of each category
+        for c in self.classes:
+            file = self.files.setdefault(c.category, FileStats())
+            file.classes += 1
+            file.fields += c.fields
+            file.overloads += c.overloads
+            file.seconds += c.seconds
+
+    def top_classes(self, n: int) -> List[ClassStats]:
+        return sorted(self.classes, key=lambda c: c.lines, reverse=True)[:n]
+
+    def to_json(self, top: int) -> Dict[str, Any]:
+        return {
+            "phases": {k: dataclasses.asdict(v) for k, v in self.phases.items()},
+            "files": {k: dataclasses.asdict(v) for k, v in self.files.items()},
+            "top_classes": [dataclasses.asdict(c) for c in self.top_classes(top)],
+        }
+
+    def write_json(self, path: pathlib.Path, top: int) -> None:
+        _ = path.write_text(json.dumps(self.to_json(top), indent=2))
+
+    def report(self, top: int) -> str:
+        rows = ["Phase            Time      Peak memory"]
+        for name, p in self.phases.items():
+            rows.append(f"{name:<12} {p.seconds:>8.3f}s {p.peak_memory / 2**20:>12.1f} MiB")
+        rows += ["", "File   Classes    Fields  Overloads     Lines        Size  Dump time"]
+        for name, f in self.files.items():
+            rows.append(
+                f"{name:<6} {f.classes:>7} {f.fields:>9} {f.overloads:>10} {f.lines:>9}"
+                f" {f.size / 1024:>7.0f} KiB {f.seconds:>9.3f}s"
+            )
+        rows += ["", f"Top {top} classes by generated lines"]
+        for c in self.top_classes(top):
+            rows.append(
+                f"{c.lines:>7} lines  {c.category:<2}  Stub{c.name}"
+                f" ({c.fields} fields, {c.overloads} overloads)"
+            )
+        rows += ["", "Times include the overhead of tracing memory allocations."]
+        return "\n".join(rows)
+
+
+def phase(stats: Optional[GenerationStats], name: str) -> ContextManager[None]:
+    """Measures a phase if statistics are collected."""
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.phase(name)
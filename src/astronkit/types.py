@@ -1,6 +1,6 @@
 import dataclasses
-from enum import Enum
-from typing import List, Literal, Protocol, Set, Tuple, Union
+from enum import Enum, Flag
+from typing import Any, Dict, Iterable, List, Literal, Protocol, Set, Tuple, Union
 
 
 class Dumper(Protocol):
@@ -8,43 +8,95 @@ class Dumper(Protocol):
 
     def add_symbol(self, sym: str): ...
 
+    def use_struct(self, alias: str): ...
+
 
 class DistributedTypeVanilla(Enum):
-    uint8 = "int"
-    uint16 = "int"
-    uint32 = "int"
-    uint64 = "int"
-    int8 = "int"
-    int16 = "int"
-    int32 = "int"
-    int64 = "int"
-    double = "float"
-    string = "str"
-    blob = "bytes"
-    largeblob = "bytes"
+    # Values are the dc names, so that every width is a distinct member
+    uint8 = "uint8"
+    uint16 = "uint16"
+    uint32 = "uint32"
+    uint64 = "uint64"
+    int8 = "int8"
+    int16 = "int16"
+    int32 = "int32"
+    int64 = "int64"
+    double = "float64"
+    string = "string"
+    blob = "blob"
+    largeblob = "blob32"
     bool_ = "bool"
-    char = "str"
-    null = "None"
+    char = "char"
+    null = "null"
 
     def dump(self, _dumper: Dumper, _is_input: bool) -> str:
-        return self.value
-
-
-class DCKeyword(Enum):
-    broadcast = "broadcast"
-    ownrecv = "ownrecv"
-    airecv = "airecv"
-    clsend = "clsend"
-    ownsend = "ownsend"
-    db = "db"
-    ram = "ram"
-    required = "required"
+        return PYTHON_TYPES[self]
+
+
+PYTHON_TYPES: Dict[DistributedTypeVanilla, str] = {
+    DistributedTypeVanilla.uint8: "int",
+    DistributedTypeVanilla.uint16: "int",
+    DistributedTypeVanilla.uint32: "int",
+    DistributedTypeVanilla.uint64: "int",
+    DistributedTypeVanilla.int8: "int",
+    DistributedTypeVanilla.int16: "int",
+    DistributedTypeVanilla.int32: "int",
+    DistributedTypeVanilla.int64: "int",
+    DistributedTypeVanilla.double: "float",
+    DistributedTypeVanilla.string: "str",
+    DistributedTypeVanilla.blob: "bytes",
+    DistributedTypeVanilla.largeblob: "bytes",
+    DistributedTypeVanilla.bool_: "bool",
+    DistributedTypeVanilla.char: "str",
+    DistributedTypeVanilla.null: "None",
+}
+
+
+class DCKeyword(Flag):
+    # A field's keywords are combined into one flag, `DCKeyword.ram in method.keywords` is a bit test
+    broadcast = 1
+    ownrecv = 2
+    airecv = 4
+    clsend = 8
+    ownsend = 16
+    db = 32
+    ram = 64
+    required = 128
+
+    @classmethod
+    def parse(cls, names: Iterable[str]) -> "DCKeyword":
+        keywords = cls(0)
+        for name in names:
+            if name not in cls.__members__:
+                raise ValueError(f"{name!r} is not a valid {cls.__name__}")
+            keywords |= cls[name]
+        return keywords
+
+    def names(self) -> List[str]:
+        # Iterating over a Flag only works from Python 3.11 on
+        return [name for name, k in DCKeyword.__members__.items() if k in self]
+
+
+class _Slotted:
+    """Base of the IR classes, which are built in large numbers.
+
+    dataclass(slots=True) needs Python 3.10, so __slots__ are declared by hand. Frozen
+    instances can't be restored attribute by attribute, so they are pickled (i.e. for
+    ParallelDumper) through their constructor.
+    """
+
+    __slots__: Tuple[str, ...] = ()
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Any, ...]]:
+        return type(self), tuple(getattr(self, name) for name in self.__slots__)
 
 
 @dataclasses.dataclass(frozen=True)
-class DistributedArray:
+class DistributedArray(_Slotted):
+    __slots__ = ("type", "size")
     type: "DistributedType"
-    size: int = -1
+    # -1 for variable-size arrays
+    size: int
 
     def dump(self, dumper: Dumper, is_input: bool) -> str:
         if is_input:
@@ -61,43 +113,133 @@ class DistributedArray:
         return "Sequence[" + self.type.dump(dumper, is_input) + "]"
 
 
-DistributedType = Union[DistributedTypeVanilla, "DistributedStruct", DistributedArray]
+@dataclasses.dataclass(frozen=True)
+class DistributedScaled(_Slotted):
+    """A number declared with a divisor or a modulus, i.e. int16/10 or uint16%360."""
+
+    __slots__ = ("type", "divisor", "modulus")
+    type: DistributedTypeVanilla
+    # The value is sent multiplied by the divisor, 1 if there is none
+    divisor: int
+    # The value is wrapped into [0, modulus) before being sent, 0 if there is none
+    modulus: float
+
+    def dump(self, dumper: Dumper, is_input: bool) -> str:
+        if self.divisor > 1:
+            return "float"
+        return self.type.dump(dumper, is_input)
+
+
+DistributedType = Union[
+    DistributedTypeVanilla, "DistributedStruct", DistributedArray, DistributedScaled
+]
 
 
 @dataclasses.dataclass(frozen=True)
-class DCParameter:
+class DCParameter(_Slotted):
+    __slots__ = ("name", "type", "has_default")
     name: Union[str, None]
     type: DistributedType
     has_default: bool
 
 
 @dataclasses.dataclass(frozen=True)
-class DistributedMethod:
+class DistributedMethod(_Slotted):
+    __slots__ = ("name", "parameters", "keywords", "number")
     name: str
-    parameters: List[DCParameter]
-    keywords: List[DCKeyword]
+    parameters: Tuple[DCParameter, ...]
+    keywords: DCKeyword
+    # Index of the field in the dc file, which is what updates are sent with
+    number: int
 
 
-@dataclasses.dataclass(frozen=True)
-class DistributedClass:
+@dataclasses.dataclass(frozen=True, eq=False)
+class DistributedClass(_Slotted):
+    # Compared by identity, there is a single instance per dclass and the visibility is mutable
+    __slots__ = ("name", "superclasses", "visibility", "fields")
     name: str
-    superclasses: List["DistributedClass"]
+    superclasses: Tuple["DistributedClass", ...]
     visibility: Set[Literal["AI", "CL", "OV", "UD"]]
-    fields: List[DistributedMethod]
+    fields: Tuple[DistributedMethod, ...]
 
 
 @dataclasses.dataclass(frozen=True)
-class DistributedStruct:
+class DistributedStruct(_Slotted):
+    __slots__ = ("name", "fields")
     name: str
-    fields: List[DCParameter]
+    fields: Tuple[DCParameter, ...]
 
-    def dump(self, _dumper: Dumper, is_input: bool):
-        if is_input:
-            return '"' + self.name + 'TIn"'
-        return '"' + self.name + 'T"'
+    def dump(self, dumper: Dumper, is_input: bool):
+        alias = self.name + ("TIn" if is_input else "T")
+        dumper.use_struct(alias)
+        return '"' + alias + '"'
 
 
 @dataclasses.dataclass(frozen=True)
-class DistributedFileDef:
-    classes: List[DistributedClass]
-    structs: List[DistributedStruct]
+class DistributedFileDef(_Slotted):
+    __slots__ = ("classes", "structs")
+    classes: Tuple[DistributedClass, ...]
+    structs: Tuple[DistributedStruct, ...]
+
+    def all_classes(self) -> List[DistributedClass]:
+        """The classes with all of their superclasses, which may have been excluded, superclasses first."""
+        classes: List[DistributedClass] = []
+        seen: Set[DistributedClass] = set()
+
+        def visit(c: DistributedClass) -> None:
+            if c in seen:
+                return
+            seen.add(c)
+            for sc in c.superclasses:
+                visit(sc)
+            classes.append(c)
+
+        for c in self.classes:
+            visit(c)
+        return classes
+
+
+class TypeTable:
+    """Interns the types and parameters built by a parser, so identical ones share one instance.
+
+    Component types are interned first, so they can be keyed by identity. The table keeps
+    every instance alive, which keeps those ids valid.
+    """
+
+    def __init__(self) -> None:
+        self.arrays: Dict[Tuple[int, int], DistributedArray] = {}
+        self.parameters: Dict[Tuple[Union[str, None], int, bool], DCParameter] = {}
+        self.scaled: Dict[Tuple[DistributedTypeVanilla, int, float], DistributedScaled] = {}
+        # Keyed by name, which is unique among the structs of a dc file
+        self.structs: Dict[str, DistributedStruct] = {}
+
+    def copy(self) -> "TypeTable":
+        """A table with the same types, new types are only added to one of them."""
+        table = TypeTable()
+        table.arrays = dict(self.arrays)
+        table.parameters = dict(self.parameters)
+        table.scaled = dict(self.scaled)
+        table.structs = dict(self.structs)
+        return table
+
+    def array(self, typ: DistributedType, size: int = -1) -> DistributedArray:
+        key = (id(typ), size)
+        if (array := self.arrays.get(key)) is None:
+            array = self.arrays[key] = DistributedArray(typ, size)
+        return array
+
+    def scale(
+        self, typ: DistributedTypeVanilla, divisor: int, modulus: float
+    ) -> DistributedScaled:
+        key = (typ, divisor, modulus)
+        if (scaled := self.scaled.get(key)) is None:
+            scaled = self.scaled[key] = DistributedScaled(typ, divisor, modulus)
+        return scaled
+
+    def parameter(
+        self, name: Union[str, None], typ: DistributedType, has_default: bool
+    ) -> DCParameter:
+        key = (name, id(typ), has_default)
+        if (param := self.parameters.get(key)) is None:
+            param = self.parameters[key] = DCParameter(name, typ, has_default)
+        return param
@@ -0,0 +1,218 @@
+from typing import Dict, List, Sequence, Set, Tuple
+
+from astronkit.types import (
+    DCParameter,
+    DistributedArray,
+    DistributedFileDef,
+    DistributedScaled,
+    DistributedType,
+    DistributedTypeVanilla,
+)
+
+VALIDATORS_MODULE = "AstronValidators"
+# Bounds of the integer types, bools are a typedef of uint8
+INT_RANGES: Dict[DistributedTypeVanilla, Tuple[int, int]] = {
+    DistributedTypeVanilla.uint8: (0, 2**8 - 1),
+    DistributedTypeVanilla.uint16: (0, 2**16 - 1),
+    DistributedTypeVanilla.uint32: (0, 2**32 - 1),
+    DistributedTypeVanilla.uint64: (0, 2**64 - 1),
+    DistributedTypeVanilla.int8: (-(2**7), 2**7 - 1),
+    DistributedTypeVanilla.int16: (-(2**15), 2**15 - 1),
+    DistributedTypeVanilla.int32: (-(2**31), 2**31 - 1),
+    DistributedTypeVanilla.int64: (-(2**63), 2**63 - 1),
+    DistributedTypeVanilla.bool_: (0, 2**8 - 1),
+}
+
+HEADER = '''\
+"""Checks of the arguments sent through the stubs, against the types of the dc fields.
+
+The stubs generated with --validators are decorated with validated, which only replaces
+their send methods if checks are enabled when this module is imported: by setting the
+ASTRONKIT_VALIDATE environment variable, or ENABLED before importing the stubs.
+Otherwise the stubs are left as they are and sending costs nothing more.
+
+What is checked, by dc type:
+- integers are ints within the bounds of their type, bools included,
+- float64 are ints or floats, and scaled numbers (int16/10) are within the bounds of
+  their type once multiplied by the divisor. Numbers with a modulus take any value,
+- string is a str, blob and blob32 are bytes,
+- char is a str of one character, and char arrays are a str or a list or tuple of
+  such characters, of the declared length if fixed (char[3]),
+- other arrays are lists or tuples of the declared length if fixed, with every item
+  checked, and structs are lists or tuples with a valid value for every field.
+
+The checks are stricter than Panda3D, which rounds floats given for integers, packs
+bytes into strings and str into blobs, takes b"a" for a char and bytes for arrays.
+They are also looser: ranges declared in the dc files are not checked, neither the
+value ranges of uint8(1-5) nor the length ranges of uint8[0-5], which is checked as
+uint8[]. Panda3D still rejects those values when packing the update.
+"""
+
+import functools
+import os
+from math import floor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+ENABLED = os.environ.get("ASTRONKIT_VALIDATE", "") not in ("", "0")
+
+
+def _int(v: Any, low: int, high: int) -> None:
+    if not isinstance(v, int) or not low <= v <= high:
+        raise ValueError(f"expected an integer in [{low}, {high}], got {v!r}")
+
+
+def _number(v: Any) -> None:
+    if not isinstance(v, (int, float)):
+        raise ValueError(f"expected a number, got {v!r}")
+
+
+def _scaled(v: Any, divisor: int, low: int, high: int) -> None:
+    _number(v)
+    if not low <= floor(v * divisor + 0.5) <= high:
+        raise ValueError(f"expected a number in [{low / divisor}, {high / divisor}], got {v!r}")
+
+
+def _string(v: Any) -> None:
+    if not isinstance(v, str):
+        raise ValueError(f"expected a str, got {v!r}")
+
+
+def _blob(v: Any) -> None:
+    if not isinstance(v, bytes):
+        raise ValueError(f"expected bytes, got {v!r}")
+
+
+def _char(v: Any) -> None:
+    if not isinstance(v, str) or len(v) != 1:
+        raise ValueError(f"expected a single character, got {v!r}")
+
+
+def _chars(v: Any, size: int) -> None:
+    # Received as a str, sent from a str or a sequence of characters
+    if not isinstance(v, str):
+        _sequence(v, size)
+        for x in v:
+            _char(x)
+    elif size >= 0 and len(v) != size:
+        raise ValueError(f"expected {size} characters, got {v!r}")
+
+
+def _sequence(v: Any, size: int) -> None:
+    if not isinstance(v, (list, tuple)):
+        raise ValueError(f"expected a list or a tuple, got {v!r}")
+    if size >= 0 and len(v) != size:
+        raise ValueError(f"expected {size} items, got {v!r}")
+
+
+def check_update(obj: Any, field: str, value: Any) -> None:
+    dcfield = obj.dclass.getFieldByName(field)
+    if dcfield is None:
+        raise ValueError(f"{obj.dclass.getName()} has no field {field}")
+    try:
+        FIELDS[dcfield.getNumber()](value)
+    except ValueError as e:
+        raise ValueError(f"Invalid arguments for {obj.dclass.getName()}.{field}: {e}") from None
+
+
+def _checking(method: Callable[..., None], offset: int) -> Callable[..., None]:
+    @functools.wraps(method)
+    def send(self: Any, *args: Any) -> None:
+        # The field and its value follow the avId of sendUpdateToAvatarId and sendUpdateToAccountId
+        check_update(self, args[offset], args[offset + 1] if len(args) > offset + 1 else ())
+        method(self, *args)
+
+    return send
+
+
+def _checking_batch(method: Callable[..., None]) -> Callable[..., None]:
+    @functools.wraps(method)
+    def send(self: Any, updates: Any) -> None:
+        updates = list(updates)
+        for field, value in updates:
+            check_update(self, field, value)
+        method(self, updates)
+
+    return send
+
+
+def validated(cls: T) -> T:
+    """Checks the updates sent by the methods of the stub, if enabled."""
+    if ENABLED:
+        for name, offset in (("sendUpdate", 0), ("sendUpdateToAvatarId", 1), ("sendUpdateToAccountId", 1)):
+            if name in cls.__dict__:
+                setattr(cls, name, _checking(cls.__dict__[name], offset))
+        if "sendUpdates" in cls.__dict__:
+            setattr(cls, "sendUpdates", _checking_batch(cls.__dict__["sendUpdates"]))
+    return cls
+'''
+
+
+class ValidatorDumper:
+    """Dumps a module with a validator for the arguments of every field, by field number.
+
+    Validators of structs, arrays and fields with the same checks are only defined once.
+    """
+
+    def __init__(self) -> None:
+        # Name of every validator by its body
+        self.validators: Dict[str, str] = {}
+
+    def dump_checks(self, typ: DistributedType, expr: str) -> List[str]:
+        """Statements raising ValueError if expr is not a valid value of the type."""
+        if isinstance(typ, DistributedTypeVanilla):
+            if typ in INT_RANGES:
+                low, high = INT_RANGES[typ]
+                return [f"_int({expr}, {low}, {high})"]
+            elif typ == DistributedTypeVanilla.double:
+                return [f"_number({expr})"]
+            elif typ == DistributedTypeVanilla.char:
+                return [f"_char({expr})"]
+            elif typ == DistributedTypeVanilla.string:
+                return [f"_string({expr})"]
+            elif typ == DistributedTypeVanilla.null:
+                return []
+            # blob and blob32
+            return [f"_blob({expr})"]
+        elif isinstance(typ, DistributedScaled):
+            if typ.type == DistributedTypeVanilla.double or typ.modulus:
+                # Any number fits once the modulus is applied
+                return [f"_number({expr})"]
+            low, high = INT_RANGES[typ.type]
+            return [f"_scaled({expr}, {typ.divisor}, {low}, {high})"]
+        elif isinstance(typ, DistributedArray):
+            if typ.type == DistributedTypeVanilla.char:
+                return [f"_chars({expr}, {typ.size})"]
+            rows = [f"_sequence(v, {typ.size})"]
+            if checks := self.dump_checks(typ.type, "x"):
+                rows += ["for x in v:", *(f"    {c}" for c in checks)]
+            return [f"{self.get_validator(rows)}({expr})"]
+        return [f"{self.get_validator(self.dump_params(typ.fields))}({expr})"]
+
+    def dump_params(self, params: Sequence[DCParameter]) -> List[str]:
+        rows = [f"_sequence(v, {len(params)})"]
+        for i, p in enumerate(params):
+            rows += self.dump_checks(p.type, f"v[{i}]")
+        return rows
+
+    def get_validator(self, rows: List[str]) -> str:
+        body = "\n".join(f"    {row}" for row in rows)
+        if (name := self.validators.get(body)) is None:
+            name = self.validators[body] = f"_v{len(self.validators)}"
+        return name
+
+    def dump_file(self, obj: DistributedFileDef) -> str:
+        fields: List[str] = []
+        numbers: Set[int] = set()
+        for c in obj.all_classes():
+            for m in c.fields:
+                if m.number not in numbers:
+                    numbers.add(m.number)
+                    name = self.get_validator(self.dump_params(m.parameters))
+                    fields.append(f"    {m.number}: {name},  # {c.name}.{m.name}")
+
+        rows = [HEADER]
+        for body, name in self.validators.items():
+            rows += ["", f"def {name}(v: Any) -> None:", body, ""]
+        rows += ["", "FIELDS: Dict[int, Callable[[Any], None]] = {", *fields, "}"]
+        return "\n".join(rows) + "\n"
@@ -0,0 +1,82 @@
+import pathlib
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from astronkit.types import DistributedClass, DistributedFileDef
+
+FileState = Optional[Tuple[int, int]]
+
+
+def snapshot(files: Sequence[Union[str, pathlib.Path]]) -> Dict[str, FileState]:
+    """The modification time and size of every file, None for missing ones."""
+    states: Dict[str, FileState] = {}
+    for f in files:
+        try:
+            stat = pathlib.Path(f).stat()
+            states[str(f)] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            states[str(f)] = None
+    return states
+
+
+def reuse_unchanged(
+    previous: Mapping[str, DistributedClass], parsed: DistributedFileDef
+) -> Tuple[DistributedFileDef, int]:
+    """Replaces the classes that did not change since the previous parse by their previous instance.
+
+    Dumpers memoize their renderings by identity, so only the changed classes get dumped again.
+    A class is unchanged if its fields, its visibility and all of its superclasses are.
+    Returns the new file and the number of changed classes.
+    """
+    reused: Dict[str, DistributedClass] = {}
+    classes: List[DistributedClass] = []
+    changed = 0
+    # Superclasses are declared first, so they are already mapped
+    for c in parsed.classes:
+        superclasses = tuple(reused.get(sc.name, sc) for sc in c.superclasses)
+        old = previous.get(c.name)
+        if (
+            old is not None
+            and old.fields == c.fields
+            and old.visibility == c.visibility
+            and len(old.superclasses) == len(superclasses)
+            and all(a is b for a, b in zip(old.superclasses, superclasses))
+        ):
+            c = old
+        else:
+            changed += 1
+            if any(a is not b for a, b in zip(c.superclasses, superclasses)):
+                c = DistributedClass(c.name, superclasses, c.visibility, c.fields)
+        reused[c.name] = c
+        classes.append(c)
+    return DistributedFileDef(tuple(classes), parsed.structs), changed
+
+
+def watch_files(
+    files: Sequence[Union[str, pathlib.Path]],
+    regenerate: Callable[[], None],
+    interval: float,
+) -> None:
+    """Calls regenerate now and every time one of the files changes, until interrupted.
+
+    The files are polled, which works the same everywhere and is cheap for a few dc files.
+    """
+
+    def run() -> None:
+        try:
+            regenerate()
+        except (ValueError, OSError) as e:
+            # i.e. a syntax error in the middle of an edit, the next save will fix it
+            print(f"Generation failed: {e}")
+
+    state = snapshot(files)
+    run()
+    print("Watching for changes, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(interval)
+            if (current := snapshot(files)) != state:
+                state = current
+                run()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,56 @@
+"""Tuple aliases are named after the first field using them, whichever process dumps them."""
+
+import io
+import pathlib
+from typing import Union
+
+from astronkit.parallel_dumper import ParallelDumper
+from astronkit.python_dumper import DumperOptions, MultiDumper
+from astronkit.python_parser import parse_dcfiles
+from astronkit.types import DistributedFileDef
+from benchmarks.dcgen import DCGenerator, DCGenOptions
+
+DC = """
+from direct.distributed import DistributedObject/AI
+from game import DistributedA/AI
+from game import DistributedB/AI
+
+dclass DistributedObject {
+};
+
+dclass DistributedA : DistributedObject {
+  setFoo(uint32[], string) broadcast;
+};
+
+dclass DistributedB : DistributedObject {
+  setFoo(int8, uint16[], blob) broadcast;
+  setBar(uint32[], string) broadcast;
+};
+"""
+
+OPTIONS = DumperOptions(alias_tuples=True)
+
+
+def render(dumper: Union[MultiDumper, ParallelDumper], parsed: DistributedFileDef) -> str:
+    header, body = dumper.dump_bodies(parsed)["AI"]
+    fp = io.StringIO()
+    body.write_to(header, fp)
+    return fp.getvalue()
+
+
+def test_names(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "game.dc"
+    _ = path.write_text(DC)
+    text = render(MultiDumper((3, 9), ["AI"], "game", OPTIONS), parse_dcfiles([path], set()))
+    assert "SetFooArgs = tuple[Sequence[int], str]" in text
+    # The name is taken by another tuple, and the same tuple keeps its first name
+    assert "SetFooArgs2 = tuple[int, Sequence[int], bytes]" in text
+    assert "SetBarArgs" not in text
+
+
+def test_parallel(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "gen.dc"
+    _ = path.write_text(DCGenerator(DCGenOptions(classes=300)).generate())
+    parsed = parse_dcfiles([path], set())
+    text = render(MultiDumper((3, 9), ["AI"], "game", OPTIONS), parsed)
+    assert render(ParallelDumper((3, 9), ["AI"], "game", 3, OPTIONS), parsed) == text
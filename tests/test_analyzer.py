@@ -0,0 +1,83 @@
+"""The sizes of the analyzer bound the updates packed by Panda3D's DCPacker."""
+
+import pathlib
+from typing import Any, Dict, List, Tuple
+
+from panda3d.direct import DCFile, DCPacker
+
+from astronkit.analyzer import field_size
+from astronkit.python_parser import parse_dcfiles
+
+DC = """
+from game import DistributedSizes
+
+typedef uint8 bool;
+
+struct Named {
+  string name;
+  uint8 kind;
+};
+
+struct Point {
+  int16 / 10 x;
+  int16 / 10 y;
+};
+
+dclass DistributedSizes {
+  setNumbers(uint8, int16, uint32, int64, float64, bool) broadcast;
+  setScaled(uint16 % 360, int16 / 10) broadcast;
+  setTexts(string, blob, char, char[3]) broadcast;
+  setArrays(uint32[], uint16[3], uint32uint8array) broadcast;
+  setStrings(string[2]) broadcast;
+  setStructs(Named[2], Point[2], Named[]) broadcast;
+  setNested(uint8[2][], string[][2]) broadcast;
+  setDimensions(string[2][3], Named[2][], uint8[2][][]) broadcast;
+  setEmpty() broadcast;
+};
+"""
+
+# The smallest arguments of every field, then larger ones
+UPDATES: Dict[str, Tuple[List[Any], List[Any]]] = {
+    "setNumbers": ([0, 0, 0, 0, 0.0, 0], [255, -1, 2**32 - 1, -(2**63), 1.5, 1]),
+    "setScaled": ([0, 0.0], [359, -3.2]),
+    "setTexts": (["", b"", "a", "abc"], ["Flippy", b"\x00" * 300, "z", "xyz"]),
+    "setArrays": ([[], [0, 0, 0], []], [[1] * 50, [1, 2, 3], [(1, 2)] * 7]),
+    "setStrings": ([["", ""]], [["ab", "c"]]),
+    "setStructs": (
+        [[("", 0), ("", 0)], [(0.0, 0.0), (0.0, 0.0)], []],
+        [[("a", 1), ("bc", 2)], [(1.5, -2.0), (0.3, 0.0)], [("d", 3)] * 4],
+    ),
+    # Two variable arrays, and a variable array of pairs of strings
+    "setNested": ([[[], []], []], [[[1, 2], [3]], [["a", "b"], ["c", ""]]]),
+    # Only prefixed if the type the dimensions were added to varies in size
+    "setDimensions": (
+        [[["", "", ""], ["", "", ""]], [[], []], [[], []]],
+        [[["a", "", "b"], ["", "cd", ""]], [[("e", 1)], []], [[[1], []], [[2, 3]]]],
+    ),
+    "setEmpty": ([], []),
+}
+
+
+def packed_size(dclass: Any, name: str, value: List[Any]) -> int:
+    field = dclass.getFieldByName(name)
+    packer = DCPacker()
+    packer.beginPack(field)
+    field.packArgs(packer, value)
+    assert packer.endPack()
+    return packer.getLength()
+
+
+def test_field_sizes(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "game.dc"
+    _ = path.write_text(DC)
+    parsed = parse_dcfiles([path], set())
+    dcfile = DCFile()
+    assert dcfile.read(str(path))
+    dclass = dcfile.getClassByName("DistributedSizes")
+    methods = {m.name: m for c in parsed.classes for m in c.fields}
+    for name, (smallest, larger) in UPDATES.items():
+        size = field_size("DistributedSizes", methods[name])
+        assert packed_size(dclass, name, smallest) == size.minimum, name
+        assert size.minimum <= packed_size(dclass, name, larger) <= size.maximum, name
+        if size.fixed:
+            assert packed_size(dclass, name, larger) == size.maximum, name
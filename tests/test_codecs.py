@@ -0,0 +1,106 @@
+"""The struct codecs pack and unpack the same bytes as Panda3D's DCPacker."""
+
+import pathlib
+import types
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from panda3d.direct import DCFile, DCPacker
+
+from astronkit.codec_dumper import CodecDumper
+from astronkit.python_parser import parse_dcfiles
+
+DC = """
+from game import DistributedCodecs
+
+typedef uint8 bool;
+
+struct Point {
+  int16 / 10 x;
+  int16 / 10 y;
+};
+
+struct Segment {
+  Point start;
+  Point end;
+  uint8 color;
+};
+
+dclass DistributedCodecs {
+  setNumbers(uint8, int8, uint16, int16, uint32, int32, uint64, int64, float64, bool) broadcast;
+  setScaled(uint16 % 360, uint16 % 360 / 10, int32 / 100, float64 / 10, int16 % 10 / 10) broadcast;
+  setArrays(uint16[3], int16 / 10[2], uint8[2][3]) broadcast;
+  setPoint(Point) broadcast;
+  setStructs(Segment, Point[2]) broadcast;
+  setMolecular : setPoint, setNumbers;
+  setText(string, uint8) broadcast;
+  setEmpty() broadcast;
+};
+"""
+
+UPDATES: Dict[str, List[Any]] = {
+    "setNumbers": [255, -128, 65535, -32768, 2**32 - 1, -(2**31), 2**64 - 1, -(2**63), -1.5, 1],
+    "setScaled": [400, 361.25, -12.345, 1.25, 12.5],
+    "setArrays": [[1, 2, 3], [1.25, -0.35], [[1, 2, 3], [4, 5, 6]]],
+    "setPoint": [(1.5, -2.25)],
+    "setStructs": [((0.1, 0.2), (-0.3, 1000.0), 7), [(1.0, 2.0), (3.0, 4.0)]],
+    "setMolecular": [(1.0, 2.0), 1, 2, 3, 4, 5, 6, 7, 8, 9.5, 0],
+    "setText": ["Flippy", 3],
+    "setEmpty": [],
+}
+
+# Variable-size, the codecs leave them to DCPacker
+VARIABLE = {"setText"}
+
+
+def pack(field: Any, value: List[Any]) -> bytes:
+    packer = DCPacker()
+    packer.beginPack(field)
+    field.packArgs(packer, value)
+    assert packer.endPack()
+    return packer.getBytes()
+
+
+def unpack(field: Any, data: bytes) -> Any:
+    packer = DCPacker()
+    packer.setUnpackData(data)
+    packer.beginUnpack(field)
+    args = field.unpackArgs(packer)
+    assert packer.endUnpack()
+    return args
+
+
+@pytest.fixture
+def generated(tmp_path: pathlib.Path) -> Tuple[Any, types.ModuleType]:
+    """The dc file read by Panda3D, and the codecs of the same file."""
+    path = tmp_path / "game.dc"
+    _ = path.write_text(DC)
+    dcfile = DCFile()
+    assert dcfile.read(str(path))
+    codecs = types.ModuleType("AstronCodecs")
+    exec(CodecDumper().dump_file(parse_dcfiles([path], set())), codecs.__dict__)
+    # The classes don't keep their file alive
+    return dcfile, codecs
+
+
+@pytest.mark.parametrize("name", list(UPDATES))
+def test_field(generated: Tuple[Any, types.ModuleType], name: str) -> None:
+    dcfile, codecs = generated
+    field = dcfile.getClassByName("DistributedCodecs").getFieldByName(name)
+    assert (field.getNumber() in codecs.FIELDS) == (name not in VARIABLE)
+    data = pack(field, UPDATES[name])
+    assert codecs.pack_field(field, UPDATES[name]) == data
+    # Unpacked in the middle of a datagram
+    args, offset = codecs.unpack_field(field, b"\x01\x02" + data + b"\x03", 2)
+    assert offset == 2 + len(data)
+    assert args == unpack(field, data)
+
+
+def test_struct(generated: Tuple[Any, types.ModuleType]) -> None:
+    # The first argument of the field, packed the same as the struct on its own
+    dcfile, codecs = generated
+    field = dcfile.getClassByName("DistributedCodecs").getFieldByName("setStructs")
+    segment = UPDATES["setStructs"][0]
+    data = pack(field, UPDATES["setStructs"])
+    assert codecs.STRUCTS["Segment"].pack(segment) == data[: codecs.STRUCTS["Segment"].size]
+    assert codecs.STRUCTS["Segment"].unpack(data) == unpack(field, data)[0]
@@ -0,0 +1,133 @@
+"""dispatch_update reads the arguments of every dc type the same as Panda3D's receiveUpdate."""
+
+import array
+import importlib
+import pathlib
+import sys
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from panda3d.core import Datagram, DatagramIterator
+from panda3d.direct import DCFile, DCPacker
+
+from astronkit.python_dumper import DumperOptions, MultiDumper
+from astronkit.python_parser import parse_dcfiles
+
+DC = """
+from game import DistributedTypes
+
+typedef uint8 bool;
+
+struct Pair {
+  int16 a;
+  string b;
+};
+
+dclass DistributedTypes {
+  setBool(bool) broadcast;
+  setChar(char) broadcast;
+  setChars(char[], char[3]) broadcast;
+  setBlobs(blob, blob32) broadcast;
+  setScaled(uint16 % 360, uint16 % 360 / 10, float64 / 10) broadcast;
+  setInt64(int64, uint64) broadcast;
+  setArrays(uint32array, uint32uint8array, int16 / 100[2], uint16[3]) broadcast;
+  setStructs(Pair, Pair[], Pair[2]) broadcast;
+  setNested(uint8[][], string[]) broadcast;
+  setDimensions(uint8[2][], string[2][3], Pair[2][]) broadcast;
+  setRanges(uint8(0-5), uint8[0-3]) broadcast;
+  setEmpty() broadcast;
+  setMolecular : setChar, setScaled;
+};
+"""
+
+UPDATES: Dict[str, List[Any]] = {
+    "setBool": [1],
+    "setChar": ["x"],
+    "setChars": ["hello", "abc"],
+    "setBlobs": [b"\x00\x01", b"zz"],
+    "setScaled": [400, 361.5, 1.25],
+    "setInt64": [-(2**40), 2**63],
+    "setArrays": [[1, 2, 3], [(1, 2), (70000, 3)], [1.5, -0.25], [1, 2, 3]],
+    "setStructs": [(5, "p"), [(1, "a"), (-2, "bb")], [(3, "c"), (4, "")]],
+    "setNested": [[[1, 2], [], [3]], ["a", "bc"]],
+    "setDimensions": [[[1], []], [["a", "", "b"], ["", "cd", ""]], [[(1, "e")], []]],
+    "setRanges": [3, [1, 2]],
+    "setEmpty": [],
+    "setMolecular": ["m", 10, 12.5, 0.5],
+}
+
+
+def record(name: str) -> Any:
+    def receive(self: Any, *args: Any) -> None:
+        self.args[name] = args
+
+    return receive
+
+
+class Received:
+    def __init__(self, dclass: Any) -> None:
+        self.dclass = dclass
+        self.args: Dict[str, Tuple[Any, ...]] = {}
+
+
+# Records the arguments of every update, instead of applying them
+for field_name in UPDATES:
+    setattr(Received, field_name, record(field_name))
+
+
+def make_datagram(dclass: Any, name: str) -> Datagram:
+    field = dclass.getFieldByName(name)
+    packer = DCPacker()
+    packer.beginPack(field)
+    field.packArgs(packer, UPDATES[name])
+    assert packer.endPack()
+    dg = Datagram()
+    dg.addUint16(field.getNumber())
+    dg.appendData(packer.getBytes())
+    # Another update follows
+    dg.addUint8(99)
+    return dg
+
+
+@pytest.mark.parametrize("array_buffers", [False, True])
+def test_receive_update(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, array_buffers: bool
+) -> None:
+    path = tmp_path / "game.dc"
+    _ = path.write_text(DC)
+    options = DumperOptions(dispatch_tables=True, array_buffers=array_buffers)
+    dumper = MultiDumper(sys.version_info[:2], ["CL"], "direct.distributed", options)
+    package = f"dispatched{int(array_buffers)}"
+    (tmp_path / package).mkdir()
+    _ = (tmp_path / package / "__init__.py").write_text("")
+    _ = (tmp_path / package / "AstronStubsCL.py").write_text(
+        dumper.dump_files(parse_dcfiles([path], set()))["CL"]
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    stubs = importlib.import_module(f"{package}.AstronStubsCL")
+
+    dcfile = DCFile()
+    assert dcfile.read(str(path))
+    dclass = dcfile.getClassByName("DistributedTypes")
+    # The recorders override the abstract receivers of the stub
+    receiver = type("DistributedTypes", (Received, stubs.StubDistributedTypes), {})
+    # None of them are left to receiveUpdate
+    numbers = {dclass.getFieldByName(name).getNumber() for name in UPDATES}
+    assert set(stubs.get_receivers(receiver)) == numbers
+    for name in UPDATES:
+        # The iterator doesn't keep its datagram alive
+        dg = make_datagram(dclass, name)
+        di = DatagramIterator(dg)
+        expected = Received(dclass)
+        dclass.receiveUpdate(expected, di)
+        assert di.getUint8() == 99
+
+        di = DatagramIterator(dg)
+        received = receiver(dclass)
+        stubs.dispatch_update(received, di)
+        assert di.getUint8() == 99
+        args = tuple(
+            x.tolist() if isinstance(x, array.array) else x for x in received.args[name]
+        )
+        assert args == expected.args[name]
+        assert [type(x) for x in args] == [type(x) for x in expected.args[name]]
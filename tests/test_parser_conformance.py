@@ -0,0 +1,49 @@
+"""Both parser backends must build the same DistributedFileDef from the same dc files."""
+
+import pathlib
+from typing import Any, Dict, List
+
+import pytest
+
+from astronkit import dclass_parser, python_parser, serialization
+from benchmarks.dcgen import KEYWORD_MIXES, DCGenerator, DCGenOptions
+
+EXAMPLES = pathlib.Path(__file__).parent.parent / "examples"
+
+
+def encode(files: List[pathlib.Path], backend: Any) -> Dict[str, Any]:
+    # DistributedClass is compared by identity, so the files are compared through the IR
+    parsed = backend.parse_dcfiles(files, set())
+    return serialization.IREncoder().encode_file(parsed)
+
+
+def assert_conform(files: List[pathlib.Path]) -> None:
+    assert encode(files, python_parser) == encode(files, dclass_parser)
+
+
+@pytest.mark.parametrize("path", sorted(EXAMPLES.glob("*.dc")), ids=lambda p: p.name)
+def test_examples(path: pathlib.Path) -> None:
+    assert_conform([path])
+
+
+@pytest.mark.parametrize("keywords", list(KEYWORD_MIXES))
+@pytest.mark.parametrize("seed", [0, 1])
+def test_generated(tmp_path: pathlib.Path, keywords: str, seed: int) -> None:
+    path = tmp_path / "gen.dc"
+    options = DCGenOptions(classes=1000, structs=40, keywords=keywords, seed=seed)
+    _ = path.write_text(DCGenerator(options).generate())
+    assert_conform([path])
+
+
+def test_several_files(tmp_path: pathlib.Path) -> None:
+    # Numbers and imports carry over from one file to the next
+    path = tmp_path / "gen.dc"
+    _ = path.write_text(DCGenerator(DCGenOptions(classes=200, structs=10)).generate())
+    assert_conform([path, *sorted(EXAMPLES.glob("*.dc"))])
+
+
+@pytest.mark.parametrize("backend", [python_parser, dclass_parser], ids=["python", "panda3d"])
+def test_unknown_exclusion(backend: Any) -> None:
+    # A ValueError, which the watcher reports and keeps running
+    with pytest.raises(ValueError, match="MissingDclassAI"):
+        backend.parse_dcfiles([EXAMPLES / "some.dc"], {"MissingDclassAI"})
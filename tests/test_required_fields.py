@@ -0,0 +1,35 @@
+"""getRequiredFields names the required fields it leaves out, which have no getter."""
+
+import pathlib
+
+from astronkit.python_dumper import DumperOptions, MultiDumper
+from astronkit.python_parser import parse_dcfiles
+
+DC = """
+from direct.distributed import DistributedObject/AI
+from game import DistributedToon/AI
+from game import DistributedNPC/AI
+
+dclass DistributedObject {
+};
+
+dclass DistributedToon : DistributedObject {
+  setName(string = "Toon") required broadcast ram;
+  setHp(int16) required broadcast ram;
+};
+
+dclass DistributedNPC : DistributedToon {
+  setKind(uint8 = 2) required broadcast ram;
+};
+"""
+
+
+def test_defaults(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "game.dc"
+    _ = path.write_text(DC)
+    dumper = MultiDumper((3, 9), ["AI"], "game", DumperOptions(required_fields=True))
+    text = dumper.dump_files(parse_dcfiles([path], set()))["AI"]
+    assert text.count('REQUIRED_FIELDS: tuple[str, ...] = ("setHp",)') == 2
+    assert "the generate. Left out: setName.\n" in text
+    # The subclass has the same getters, but leaves out one more field
+    assert "the generate. Left out: setName, setKind.\n" in text
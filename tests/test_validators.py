@@ -0,0 +1,62 @@
+"""The validators check the Python type of strings, blobs and chars, like Panda3D unpacks them."""
+
+import pathlib
+import types
+from typing import Any, Callable
+
+import pytest
+
+from astronkit.python_parser import parse_dcfiles
+from astronkit.validator_dumper import ValidatorDumper
+
+DC = """
+from game import DistributedTexts
+
+dclass DistributedTexts {
+  setString(string) broadcast;
+  setBlobs(blob, blob32) broadcast;
+  setChar(char) broadcast;
+  setChars(char[]) broadcast;
+  setFixedChars(char[3]) broadcast;
+};
+"""
+
+
+@pytest.fixture
+def check(tmp_path: pathlib.Path) -> Callable[..., Any]:
+    path = tmp_path / "game.dc"
+    _ = path.write_text(DC)
+    parsed = parse_dcfiles([path], set())
+    module = types.ModuleType("AstronValidators")
+    exec(ValidatorDumper().dump_file(parsed), module.__dict__)
+    numbers = {m.name: m.number for c in parsed.classes for m in c.fields}
+
+    def check(field: str, *args: Any) -> None:
+        module.FIELDS[numbers[field]](args)
+
+    return check
+
+
+def test_valid(check: Callable[..., Any]) -> None:
+    check("setString", "Flippy")
+    check("setBlobs", b"\x00", b"\x01")
+    check("setChar", "a")
+    check("setChars", "hello")
+    check("setChars", ["h", "i"])
+    check("setFixedChars", "abc")
+
+
+@pytest.mark.parametrize(
+    "field, args",
+    [
+        ("setString", (b"Flippy",)),
+        ("setBlobs", ("\x00", b"\x01")),
+        ("setBlobs", (b"\x00", "\x01")),
+        ("setChar", ("ab",)),
+        ("setChars", (["ab"],)),
+        ("setFixedChars", ("ab",)),
+    ],
+)
+def test_invalid(check: Callable[..., Any], field: str, args: Any) -> None:
+    with pytest.raises(ValueError):
+        check(field, *args)